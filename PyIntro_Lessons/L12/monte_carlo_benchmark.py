@@ -0,0 +1,383 @@
+"""
+Benchmarks for the Monte Carlo engine in monte_carlo_simulation.py
+
+Run with: python monte_carlo_benchmark.py
+"""
+import os
+import time
+import tracemalloc
+
+import numpy as np
+from scipy.stats import norm
+
+from monte_carlo_simulation import (
+    SAMPLING_METHODS, VARIANCE_REDUCTION_METHODS, BootstrapModel, GBMModel, HestonModel, MertonJumpModel,
+    QuantileSketch, StreamingPathStats, calculate_portfolio_value, calculate_var_cvar, constant_correlation,
+    correlation_cholesky, monte_carlo_multi_asset, monte_carlo_parallel, monte_carlo_replications,
+    monte_carlo_simulation, monte_carlo_streaming, portfolio_paths, replication_estimates, risk_metrics,
+    simulate_in_chunks, simulate_parallel, simulate_streaming,
+)
+
+# Dashboard defaults
+INITIAL_PRICE = 100.0
+DRIFT = 0.08
+VOLATILITY = 0.25
+
+
+def loop_simulation(initial_price, drift, volatility, time_horizon, num_simulations):
+    """
+    The original day-by-day loop, kept as the baseline
+    """
+    dt = 1/252
+    simulations = np.zeros((num_simulations, time_horizon + 1))
+    simulations[:, 0] = initial_price
+    random_shocks = np.random.normal(0, 1, (num_simulations, time_horizon))
+    for t in range(1, time_horizon + 1):
+        simulations[:, t] = simulations[:, t-1] * np.exp(
+            (drift - 0.5 * volatility**2) * dt +
+            volatility * np.sqrt(dt) * random_shocks[:, t-1]
+        )
+    return simulations
+
+
+def loop_portfolio_value(initial_investment, simulations, time_horizon):
+    """
+    The original per-path portfolio loop, kept as the baseline
+    """
+    portfolio_values = np.zeros((simulations.shape[0], time_horizon + 1))
+    for i in range(simulations.shape[0]):
+        shares = initial_investment / simulations[i, 0]
+        portfolio_values[i, :] = shares * simulations[i, :]
+    return portfolio_values
+
+
+def best_time(func, *args, repeat=3):
+    """
+    Best wall-clock time of a few runs, in seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_vectorized(num_simulations=10_000, time_horizon=1_000):
+    """
+    Compares the vectorized engine with the loop on identical random draws
+    """
+    args = (INITIAL_PRICE, DRIFT, VOLATILITY, time_horizon, num_simulations)
+
+    np.random.seed(42)
+    expected = loop_simulation(*args)
+    np.random.seed(42)
+    actual = monte_carlo_simulation(*args)
+    assert np.allclose(actual, expected, rtol=1e-9), "Vectorized paths differ from the loop"
+
+    loop = best_time(loop_simulation, *args)
+    vectorized = best_time(monte_carlo_simulation, *args)
+    # The sharded engines draw from a Generator, whose sampler is faster than np.random's
+    generator = best_time(lambda: monte_carlo_simulation(*args, rng=np.random.default_rng(42)))
+    print(f"GBM {num_simulations:,} paths x {time_horizon:,} days")
+    print(f"  loop:       {loop:7.3f}s")
+    print(f"  vectorized: {vectorized:7.3f}s  ({loop / vectorized:.2f}x)")
+    print(f"  Generator:  {generator:7.3f}s  ({loop / generator:.2f}x)")
+
+
+def peak_memory_mb(func, *args, **kwargs):
+    """
+    Peak memory traced while func runs, in MB
+    """
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_streaming(path_counts=(50_000, 200_000, 800_000), time_horizon=252, chunk_size=10_000):
+    """
+    Peak memory of the chunked engine as the number of paths grows
+    """
+    print(f"Streaming GBM, {time_horizon} days, chunks of {chunk_size:,} paths")
+    for num_simulations in path_counts:
+        full_matrix = num_simulations * (time_horizon + 1) * 8 / 1e6
+        start = time.perf_counter()
+        peak = peak_memory_mb(monte_carlo_streaming, INITIAL_PRICE, DRIFT, VOLATILITY,
+                              time_horizon, num_simulations, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        print(f"  {num_simulations:>9,} paths: peak {peak:7.1f} MB "
+              f"(full matrix {full_matrix:8.1f} MB)  {elapsed:6.2f}s")
+
+
+def benchmark_parallel(num_simulations=20_000, time_horizon=1_000, seed=42):
+    """
+    Scaling of the sharded engine with worker count, checking reproducibility
+    """
+    args = (INITIAL_PRICE, DRIFT, VOLATILITY, time_horizon, num_simulations)
+    cores = os.cpu_count() or 1
+    print(f"Parallel GBM {num_simulations:,} paths x {time_horizon:,} days ({cores} cores)")
+    single = best_time(monte_carlo_simulation, *args)
+    print(f"  single-threaded: {single:7.3f}s")
+    for workers in sorted({1, 2, 4, cores}):
+        first = monte_carlo_parallel(*args, seed=seed, workers=workers)
+        again = monte_carlo_parallel(*args, seed=seed, workers=workers, use_processes=True)
+        assert np.array_equal(first, again), "Same seed and worker count gave different paths"
+        for use_processes in (False, True):
+            elapsed = best_time(lambda: monte_carlo_parallel(*args, seed=seed, workers=workers,
+                                                             use_processes=use_processes))
+            pool = "processes" if use_processes else "threads"
+            print(f"  {workers:2d} {pool:9s}:    {elapsed:7.3f}s  ({single / elapsed:.1f}x)")
+
+
+def benchmark_variance_reduction(num_simulations=10_000, time_horizon=252, confidence_level=0.05, seed=42):
+    """
+    Standard errors of each variance reduction method at a fixed path count.
+
+    The equivalent column is how many plain paths would give the same
+    standard error, from the 1/sqrt(N) convergence of plain sampling.
+    """
+    args = (INITIAL_PRICE, DRIFT, VOLATILITY, time_horizon, num_simulations)
+    print(f"Variance reduction, {num_simulations:,} paths x {time_horizon} days, "
+          f"VaR/CVaR at {confidence_level:.0%}")
+    plain_se = None
+    for method in VARIANCE_REDUCTION_METHODS:
+        simulations = monte_carlo_replications(*args, variance_reduction=method, seed=seed)
+        estimates = replication_estimates(simulations, INITIAL_PRICE, DRIFT, confidence_level, method)
+        if plain_se is None:
+            plain_se = estimates
+        equivalent = num_simulations * (plain_se['cvar_se'] / estimates['cvar_se']) ** 2
+        print(f"  {str(method):16s} mean {estimates['mean_final_price']:7.3f} "
+              f"(se {estimates['mean_final_price_se']:.3f})  "
+              f"VaR {estimates['var']:7.4f} (se {estimates['var_se']:.4f})  "
+              f"CVaR {estimates['cvar']:7.4f} (se {estimates['cvar_se']:.4f})  "
+              f"~{equivalent:9,.0f} plain paths")
+
+
+def benchmark_quasi_monte_carlo(path_counts=(1_024, 4_096, 16_384), time_horizon=252,
+                                confidence_level=0.05, repeats=16, seed=42):
+    """
+    Convergence of quasi-random against pseudo-random sampling.
+
+    Root-mean-square error of the mean final price and the VaR of the final
+    return over independently scrambled runs, measured against the exact
+    lognormal values. Plain sampling halves its error for every 4x paths.
+    """
+    years = time_horizon / 252
+    exact_mean = INITIAL_PRICE * np.exp(DRIFT * years)
+    exact_var = np.exp((DRIFT - 0.5 * VOLATILITY**2) * years
+                       + VOLATILITY * np.sqrt(years) * norm.ppf(confidence_level)) - 1
+    rng = np.random.default_rng(seed)
+    print(f"Quasi-Monte Carlo convergence, {time_horizon} days, RMSE over {repeats} runs")
+    for num_simulations in path_counts:
+        for sampling in SAMPLING_METHODS:
+            errors = []
+            start = time.perf_counter()
+            for _ in range(repeats):
+                simulations = monte_carlo_simulation(INITIAL_PRICE, DRIFT, VOLATILITY, time_horizon,
+                                                     num_simulations, rng, sampling=sampling)
+                final = simulations[:, -1]
+                var, _ = calculate_var_cvar((final - INITIAL_PRICE) / INITIAL_PRICE, confidence_level)
+                errors.append((final.mean() - exact_mean, var - exact_var))
+            elapsed = (time.perf_counter() - start) / repeats
+            mean_rmse, var_rmse = np.sqrt(np.mean(np.square(errors), axis=0))
+            print(f"  {num_simulations:>7,} paths {sampling:6s}: mean RMSE {mean_rmse:7.4f}  "
+                  f"VaR RMSE {var_rmse:.5f}  {elapsed:6.3f}s/run")
+
+
+def benchmark_portfolio(num_simulations=10_000, time_horizon=1_000, num_assets=10, initial_investment=10_000):
+    """
+    Portfolio valuation: per-path loop against broadcasting and the lazy view,
+    then a multi-asset portfolio bought and held or rebalanced
+    """
+    simulations = monte_carlo_simulation(INITIAL_PRICE, DRIFT, VOLATILITY, time_horizon, num_simulations)
+    expected = loop_portfolio_value(initial_investment, simulations, time_horizon)
+    assert np.allclose(calculate_portfolio_value(initial_investment, simulations, time_horizon), expected)
+    lazy = calculate_portfolio_value(initial_investment, simulations, time_horizon, lazy=True)
+    assert np.allclose(lazy.mean(axis=0), expected.mean(axis=0))
+
+    def dashboard_reads(values):
+        # What the dashboard reads: final values, mean path and worst value
+        return values[:, -1], values.mean(axis=0), values.min()
+
+    print(f"Portfolio value, {num_simulations:,} paths x {time_horizon:,} days")
+    for name, func in [
+        ("loop", lambda: dashboard_reads(loop_portfolio_value(initial_investment, simulations, time_horizon))),
+        ("broadcast", lambda: dashboard_reads(calculate_portfolio_value(initial_investment, simulations,
+                                                                         time_horizon))),
+        ("lazy view", lambda: dashboard_reads(calculate_portfolio_value(initial_investment, simulations,
+                                                                         time_horizon, lazy=True))),
+    ]:
+        peak = peak_memory_mb(func)
+        print(f"  {name:10s} {best_time(func):7.3f}s  peak {peak:7.1f} MB")
+
+    price_paths = np.stack([
+        monte_carlo_simulation(INITIAL_PRICE, DRIFT, VOLATILITY, 252, num_simulations)
+        for _ in range(num_assets)
+    ])
+    weights = np.full(num_assets, 1 / num_assets)
+    print(f"  {num_assets} assets x {num_simulations:,} paths x 252 days:")
+    for rebalance_every in (None, 21, 1):
+        elapsed = best_time(portfolio_paths, price_paths, weights, initial_investment, rebalance_every)
+        label = "buy and hold" if rebalance_every is None else f"rebalance /{rebalance_every}d"
+        print(f"    {label:15s} {elapsed:7.3f}s")
+
+
+def dashboard_risk_baseline(simulations, initial_price, confidence_level=0.05):
+    """
+    What the risk tabs computed before risk_metrics: percentile bands by full
+    sorts and VaR/CVaR every 30 days by calculate_var_cvar
+    """
+    percentile_5 = np.percentile(simulations, 5, axis=0)
+    percentile_95 = np.percentile(simulations, 95, axis=0)
+    risk_over_time = [
+        calculate_var_cvar((simulations[:, t] - initial_price) / initial_price, confidence_level)
+        for t in range(0, simulations.shape[1], 30)
+    ]
+    return percentile_5, percentile_95, risk_over_time
+
+
+def benchmark_risk_metrics(num_simulations=10_000, time_horizon=1_000, confidence_level=0.05):
+    """
+    The batched risk engine, every day, against the old 30-day sampled loop
+    """
+    simulations = monte_carlo_simulation(INITIAL_PRICE, DRIFT, VOLATILITY, time_horizon, num_simulations)
+    risk = risk_metrics(simulations, INITIAL_PRICE, confidence_level)
+    final_returns = (simulations[:, -1] - INITIAL_PRICE) / INITIAL_PRICE
+    assert np.allclose((risk['var'][-1], risk['cvar'][-1]), calculate_var_cvar(final_returns, confidence_level))
+    assert np.allclose(risk['percentiles'][95], np.percentile(simulations, 95, axis=0))
+
+    baseline = best_time(dashboard_risk_baseline, simulations, INITIAL_PRICE, confidence_level)
+    batched = best_time(risk_metrics, simulations, INITIAL_PRICE, confidence_level)
+    print(f"Risk metrics, {num_simulations:,} paths x {time_horizon:,} days")
+    print(f"  sorts, VaR every 30 days: {baseline:7.3f}s")
+    print(f"  risk_metrics, every day:  {batched:7.3f}s  (+ drawdowns and probability of loss)")
+
+
+def benchmark_quantile_sketch(num_simulations=200_000, time_horizon=252, chunk_size=10_000,
+                              confidence_level=0.05, shards=4, k=256, seed=42):
+    """
+    Terminal VaR/CVaR from mergeable sketches against the exact values.
+
+    Chunks go round-robin into one QuantileSketch per shard, which are then
+    merged, alongside the histogram accumulator; only the terminal prices
+    are kept to compute the exact answer. Sharded, seeded sketch runs of
+    monte_carlo_streaming must reproduce exactly, merge included.
+    """
+    rng = np.random.default_rng(seed)
+    sketches = [QuantileSketch(k, seed=i) for i in range(shards)]
+    histogram = StreamingPathStats(INITIAL_PRICE, time_horizon)
+    finals = []
+    for i, chunk in enumerate(simulate_in_chunks(
+        lambda n: monte_carlo_simulation(INITIAL_PRICE, DRIFT, VOLATILITY, time_horizon, n, rng),
+        num_simulations, chunk_size
+    )):
+        returns = (chunk[:, -1] - INITIAL_PRICE) / INITIAL_PRICE
+        sketches[i % shards].update(returns)
+        histogram.update(chunk)
+        finals.append(returns)
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+
+    exact_var, exact_cvar = calculate_var_cvar(np.concatenate(finals), confidence_level)
+    histogram_var, histogram_cvar = histogram.var_cvar(confidence_level)
+    sketch_var, sketch_cvar = merged.quantile(confidence_level), merged.tail_mean(confidence_level)
+    stored = sum(len(values) for values in merged.levels)
+    print(f"Quantile sketch (k={k}), {num_simulations:,} terminal returns over {shards} merged shards")
+    print(f"  exact:     VaR {exact_var:.5f}  CVaR {exact_cvar:.5f}")
+    print(f"  histogram: VaR {histogram_var:.5f}  CVaR {histogram_cvar:.5f}  "
+          f"({histogram.counts.shape[1]} bins per day)")
+    print(f"  sketch:    VaR {sketch_var:.5f}  CVaR {sketch_cvar:.5f}  ({stored} values kept)")
+
+    first, second = (monte_carlo_streaming(INITIAL_PRICE, DRIFT, VOLATILITY, time_horizon, num_simulations,
+                                           chunk_size, confidence_level, seed=seed, workers=shards, sketch_k=k)
+                     for _ in range(2))
+    same = [np.array_equal(first[key], second[key]) for key in ('mean_path', 'var', 'cvar')]
+    same += [np.array_equal(first['percentiles'][p], second['percentiles'][p]) for p in first['percentiles']]
+    assert all(same), "Seeded sharded sketch runs differ"
+    print(f"  sharded:   VaR {first['var']:.5f}  CVaR {first['cvar']:.5f}  "
+          f"(seed {seed}, {shards} shards, identical on rerun)")
+
+
+def benchmark_multi_asset(num_assets=100, num_simulations=100_000, time_horizon=21, chunk_size=5_000,
+                          correlation=0.3, confidence_level=0.05, seed=42):
+    """
+    Correlated multi-asset engine at scale, in float32 and float64.
+
+    Paths are generated a chunk at a time and folded into an equally
+    weighted portfolio, whose terminal VaR/CVaR go through calculate_var_cvar.
+    """
+    matrix = constant_correlation(num_assets, correlation)
+    start = time.perf_counter()
+    correlation_cholesky(matrix)
+    first = time.perf_counter() - start
+    cached = best_time(correlation_cholesky, matrix)
+    print(f"Multi-asset GBM, {num_assets} assets x {num_simulations:,} paths x {time_horizon} days")
+    print(f"  Cholesky: first {first * 1e3:.2f} ms, cached {cached * 1e3:.2f} ms")
+
+    prices = np.full(num_assets, INITIAL_PRICE)
+    drifts = np.full(num_assets, DRIFT)
+    volatilities = np.full(num_assets, VOLATILITY)
+    weights = np.ones(num_assets)
+    for dtype in (np.float32, np.float64):
+        rng = np.random.default_rng(seed)
+
+        def run():
+            finals = simulate_in_chunks(
+                lambda n: portfolio_paths(monte_carlo_multi_asset(prices, drifts, volatilities, matrix,
+                                                                  time_horizon, n, rng, dtype), weights, 1.0)[:, -1],
+                num_simulations, chunk_size
+            )
+            return calculate_var_cvar(np.concatenate(list(finals)) - 1, confidence_level)
+
+        start = time.perf_counter()
+        var, cvar = run()
+        elapsed = time.perf_counter() - start
+        chunk_mb = num_assets * chunk_size * (time_horizon + 1) * np.dtype(dtype).itemsize / 1e6
+        print(f"  {np.dtype(dtype).name}: {elapsed:6.2f}s  portfolio VaR {var:.4f} CVaR {cvar:.4f}  "
+              f"({chunk_mb:.0f} MB per chunk)")
+
+
+def benchmark_models(num_simulations=10_000, time_horizon=252, confidence_level=0.05, seed=42):
+    """
+    Speed and tail risk of each price model on the shared engines.
+
+    The bootstrap resamples a synthetic fat-tailed history with the GBM's
+    drift and volatility; the streaming run checks each model also works
+    chunked and sharded at constant memory.
+    """
+    rng = np.random.default_rng(seed)
+    history = (rng.standard_t(4, 2_520) * VOLATILITY / np.sqrt(2 * 252)
+               + (DRIFT - 0.5 * VOLATILITY**2) / 252)
+    models = {
+        "GBM": GBMModel(DRIFT, VOLATILITY),
+        "Jump Diffusion": MertonJumpModel(DRIFT, 0.2, jump_intensity=2.0, jump_mean=-0.08, jump_std=0.1),
+        "Heston": HestonModel(DRIFT, VOLATILITY**2, VOLATILITY**2, mean_reversion=2.0, vol_of_vol=0.6),
+        "Bootstrap": BootstrapModel(history, block_size=20),
+    }
+    print(f"Price models, {num_simulations:,} paths x {time_horizon} days")
+    for name, model in models.items():
+        elapsed = best_time(lambda: simulate_parallel(model, INITIAL_PRICE, time_horizon, num_simulations,
+                                                      seed=seed))
+        simulations = simulate_parallel(model, INITIAL_PRICE, time_horizon, num_simulations, seed=seed)
+        var, cvar = calculate_var_cvar((simulations[:, -1] - INITIAL_PRICE) / INITIAL_PRICE, confidence_level)
+        streamed = simulate_streaming(model, INITIAL_PRICE, time_horizon, num_simulations, chunk_size=2_500,
+                                      confidence_level=confidence_level, seed=seed, workers=2)
+        print(f"  {name:15s} {elapsed:6.3f}s  VaR {var:7.4f}  CVaR {cvar:7.4f}  "
+              f"(streamed VaR {streamed['var']:7.4f}  CVaR {streamed['cvar']:7.4f})")
+
+
+if __name__ == "__main__":
+    benchmark_vectorized()
+    benchmark_streaming()
+    benchmark_parallel()
+    benchmark_variance_reduction()
+    benchmark_quasi_monte_carlo()
+    benchmark_portfolio()
+    benchmark_risk_metrics()
+    benchmark_quantile_sketch()
+    benchmark_multi_asset()
+    benchmark_models()
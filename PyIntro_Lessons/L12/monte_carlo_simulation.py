@@ -4,8 +4,13 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import os
 import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
+from scipy.stats import norm, qmc
 
 # Set page config
 st.set_page_config(
@@ -15,43 +20,885 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def monte_carlo_simulation(initial_price, drift, volatility, time_horizon, num_simulations):
+def monte_carlo_simulation(initial_price, drift, volatility, time_horizon, num_simulations, rng=None,
+                           variance_reduction=None, sampling='pseudo'):
     """
     Run Monte Carlo simulation for stock price prediction
+
+    Shocks come from rng (a numpy Generator) when given, otherwise from
+    the global np.random state. variance_reduction is one of
+    VARIANCE_REDUCTION_METHODS and shapes the shocks of the whole batch,
+    except 'control_variate', which only reweights estimates and is
+    rejected here (see replication_estimates).
+    sampling is one of SAMPLING_METHODS; the quasi-random ones draw the
+    shocks from a scrambled low-discrepancy sequence.
+    """
+    simulations = np.empty((num_simulations, time_horizon + 1))
+    _fill_gbm_paths(simulations, initial_price, drift, volatility, rng, variance_reduction, sampling)
+    return simulations
+
+# None is plain sampling; control variates leave the paths plain and act in replication_estimates,
+# so the path generators reject them
+VARIANCE_REDUCTION_METHODS = (None, 'antithetic', 'control_variate', 'moment_matching')
+
+SAMPLING_METHODS = ('pseudo', 'sobol', 'halton')
+
+@lru_cache(maxsize=16)
+def brownian_bridge_schedule(num_steps):
+    """
+    Construction order of a Brownian bridge over num_steps unit time steps.
+
+    Returns (index, left, right, left_weight, right_weight, scale) arrays:
+    the k-th normal fills W[index[k]] from the already known W[left[k]]
+    and W[right[k]], with W[0] = 0 and the first normal setting the
+    terminal value W[num_steps].
+    """
+    schedule = [(num_steps, 0, 0, 0.0, 0.0, np.sqrt(num_steps))]
+    intervals = [(0, num_steps)]
+    while intervals:
+        next_intervals = []
+        for left, right in intervals:
+            if right - left < 2:
+                continue
+            mid = (left + right) // 2
+            schedule.append((mid, left, right, (right - mid) / (right - left), (mid - left) / (right - left),
+                             np.sqrt((mid - left) * (right - mid) / (right - left))))
+            next_intervals += [(left, mid), (mid, right)]
+        intervals = next_intervals
+    index, left, right, left_weight, right_weight, scale = zip(*schedule)
+    return (np.array(index), np.array(left), np.array(right),
+            np.array(left_weight), np.array(right_weight), np.array(scale))
+
+def brownian_bridge_increments(normals):
+    """
+    Turns (paths, steps) independent normals into Brownian increments, bridge-ordered.
+
+    The first columns, where low-discrepancy points are most uniform, set
+    the terminal value and the coarse shape of each path; the last ones
+    only fill in fine detail. The increments are still iid N(0, 1).
+    """
+    num_paths, num_steps = normals.shape
+    # Time runs along the first axis so each step fills one contiguous row
+    brownian = np.zeros((num_steps + 1, num_paths))
+    for k, (index, left, right, left_weight, right_weight, scale) in enumerate(
+        zip(*brownian_bridge_schedule(num_steps))
+    ):
+        brownian[index] = left_weight * brownian[left] + right_weight * brownian[right] + scale * normals[:, k]
+    return np.diff(brownian, axis=0).T
+
+def _standard_normals(random, shape, sampling='pseudo'):
+    """
+    (paths, steps) standard normal shocks from pseudo-random or scrambled quasi-random points
     """
+    if sampling == 'pseudo':
+        return random.normal(0, 1, shape)
+    num_paths, num_steps = shape
+    if num_paths == 0 or num_steps == 0:
+        return np.empty(shape)
+    # The scramble is what makes independent quasi-random batches possible
+    seed = random if isinstance(random, np.random.Generator) else np.random.randint(2**32)
+    if sampling == 'sobol':
+        engine = qmc.Sobol(num_steps, scramble=True, seed=seed)
+    else:
+        engine = qmc.Halton(num_steps, scramble=True, seed=seed)
+    with warnings.catch_warnings():
+        # Sobol points balance best at powers of 2 but any prefix is still low-discrepancy
+        warnings.simplefilter('ignore', UserWarning)
+        uniforms = engine.random(num_paths)
+    np.clip(uniforms, 1e-12, 1 - 1e-12, out=uniforms)
+    return brownian_bridge_increments(norm.ppf(uniforms))
+
+def _fill_gbm_paths(simulations, initial_price, drift, volatility, rng=None, variance_reduction=None,
+                    sampling='pseudo'):
+    """
+    Fills a preallocated (paths, time_horizon + 1) array with GBM prices
+    """
+    num_paths, num_steps = simulations.shape
+    log_returns = _gbm_log_returns((num_paths, num_steps - 1), drift, volatility,
+                                   np.random if rng is None else rng, variance_reduction, sampling)
+    _log_returns_to_prices(simulations, initial_price, log_returns)
+
+def _gbm_log_returns(shape, drift, volatility, random, variance_reduction=None, sampling='pseudo'):
+    """
+    A new (paths, days) array of daily GBM log-returns
+    """
+    if variance_reduction not in VARIANCE_REDUCTION_METHODS:
+        raise ValueError(f"Unknown variance reduction method: {variance_reduction!r}")
+    if variance_reduction == 'control_variate':
+        raise ValueError("Control variates do not change the paths: simulate plain paths and pass "
+                         "'control_variate' to replication_estimates")
+    if sampling not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method: {sampling!r}")
     dt = 1/252  # Daily time step (252 trading days per year)
-    
-    # Initialize results array
-    simulations = np.zeros((num_simulations, time_horizon + 1))
-    simulations[:, 0] = initial_price
-    
-    # Generate random shocks
-    random_shocks = np.random.normal(0, 1, (num_simulations, time_horizon))
-    
-    # Run simulations
-    for t in range(1, time_horizon + 1):
-        # Geometric Brownian Motion formula
-        simulations[:, t] = simulations[:, t-1] * np.exp(
-            (drift - 0.5 * volatility**2) * dt + 
-            volatility * np.sqrt(dt) * random_shocks[:, t-1]
-        )
-    
+    loc = (drift - 0.5 * volatility**2) * dt
+    scale = volatility * np.sqrt(dt)
+    if variance_reduction is None and sampling == 'pseudo':
+        # The generator applies loc and scale as it draws: one pass over the array
+        return random.normal(loc, scale, shape)
+
+    num_paths = shape[0]
+    if variance_reduction == 'antithetic':
+        # The second half of the paths mirrors the first: shocks Z and -Z
+        half = (num_paths + 1) // 2
+        log_returns = np.empty(shape)
+        log_returns[:half] = _standard_normals(random, (half, shape[1]), sampling)
+        np.negative(log_returns[:num_paths - half], out=log_returns[half:])
+    else:
+        log_returns = _standard_normals(random, shape, sampling)
+    if variance_reduction == 'moment_matching' and num_paths > 1:
+        # Rescale each day's shocks to exactly zero mean and unit variance across paths
+        log_returns -= log_returns.mean(axis=0)
+        log_returns /= log_returns.std(axis=0)
+
+    log_returns *= scale
+    log_returns += loc
+    return log_returns
+
+def _log_returns_to_prices(simulations, initial_price, log_returns):
+    """
+    Fills simulations with the prices of (..., days) log-returns along the last axis.
+
+    initial_price broadcasts against simulations.
+    """
+    simulations[..., :1] = initial_price
+    # S_t = S_0 * exp(cumulative sum of the log-returns), summed straight into the
+    # results and finished in place instead of looping over days
+    prices = simulations[..., 1:]
+    np.cumsum(log_returns, axis=-1, out=prices)
+    np.exp(prices, out=prices)
+    prices *= initial_price
+
+class PathModel:
+    """
+    Base class for price models that plug into the shared simulation engines.
+
+    A model only has to return a new (paths, days) array of daily
+    log-returns from sample_log_returns; turning them into prices,
+    chunking, sharding across workers and streaming statistics are shared
+    by every model through simulate_parallel and simulate_streaming.
+    Models are plain picklable objects so they can run on a process pool.
+    """
+
+    def sample_log_returns(self, num_paths, num_days, random):
+        raise NotImplementedError
+
+    def fill_paths(self, simulations, initial_price, rng=None):
+        """
+        Fills a preallocated (paths, time_horizon + 1) array with prices
+        """
+        num_paths, num_steps = simulations.shape
+        log_returns = self.sample_log_returns(num_paths, num_steps - 1, np.random if rng is None else rng)
+        _log_returns_to_prices(simulations, initial_price, log_returns)
+
+    def simulate(self, initial_price, time_horizon, num_simulations, rng=None):
+        """
+        (num_simulations, time_horizon + 1) price paths, like monte_carlo_simulation
+        """
+        simulations = np.empty((num_simulations, time_horizon + 1))
+        self.fill_paths(simulations, initial_price, rng)
+        return simulations
+
+    def log_bounds(self, initial_price, time_horizon):
+        """
+        Per-day log-price range for mergeable histograms, or None if unknown
+        """
+        return None
+
+class GBMModel(PathModel):
+    """
+    Geometric Brownian Motion with constant drift and volatility
+    """
+
+    def __init__(self, drift, volatility, variance_reduction=None, sampling='pseudo'):
+        self.drift = drift
+        self.volatility = volatility
+        self.variance_reduction = variance_reduction
+        self.sampling = sampling
+
+    def sample_log_returns(self, num_paths, num_days, random):
+        return _gbm_log_returns((num_paths, num_days), self.drift, self.volatility, random,
+                                self.variance_reduction, self.sampling)
+
+    def log_bounds(self, initial_price, time_horizon):
+        return gbm_log_bounds(initial_price, self.drift, self.volatility, time_horizon)
+
+class MertonJumpModel(PathModel):
+    """
+    Merton jump-diffusion: GBM plus Poisson-timed lognormal jumps.
+
+    jump_intensity is the expected number of jumps per year and each jump
+    multiplies the price by exp(N(jump_mean, jump_std**2)). The drift is
+    compensated for the average jump, so the expected price grows at
+    drift as under GBM while the tails get fatter.
+    """
+
+    def __init__(self, drift, volatility, jump_intensity=1.0, jump_mean=-0.05, jump_std=0.1):
+        self.drift = drift
+        self.volatility = volatility
+        self.jump_intensity = jump_intensity
+        self.jump_mean = jump_mean
+        self.jump_std = jump_std
+
+    def sample_log_returns(self, num_paths, num_days, random):
+        dt = 1/252
+        mean_jump = np.exp(self.jump_mean + 0.5 * self.jump_std**2) - 1
+        log_returns = _gbm_log_returns((num_paths, num_days), self.drift - self.jump_intensity * mean_jump,
+                                       self.volatility, random)
+        # The sum of n normal jump sizes is itself normal: n * mean + sqrt(n) * std * Z
+        num_jumps = random.poisson(self.jump_intensity * dt, log_returns.shape)
+        jumped = np.nonzero(num_jumps)
+        counts = num_jumps[jumped]
+        log_returns[jumped] += (counts * self.jump_mean
+                                + np.sqrt(counts) * self.jump_std * random.normal(0, 1, counts.shape))
+        return log_returns
+
+class HestonModel(PathModel):
+    """
+    Heston stochastic volatility, discretised with full-truncation Euler.
+
+    The variance starts at initial_variance and reverts to long_variance
+    at rate mean_reversion, with volatility vol_of_vol and shocks
+    correlated with the price's by correlation. Negative variances are
+    floored at zero wherever they enter the drift or diffusion, but the
+    variance itself is left to recover on its own, which keeps the scheme
+    unbiased enough at daily steps. The recursion is a loop over days,
+    vectorised across paths.
+    """
+
+    def __init__(self, drift, initial_variance=0.04, long_variance=0.04, mean_reversion=2.0, vol_of_vol=0.5,
+                 correlation=-0.7):
+        self.drift = drift
+        self.initial_variance = initial_variance
+        self.long_variance = long_variance
+        self.mean_reversion = mean_reversion
+        self.vol_of_vol = vol_of_vol
+        self.correlation = correlation
+
+    def sample_log_returns(self, num_paths, num_days, random):
+        dt = 1/252
+        variance = np.full(num_paths, float(self.initial_variance))
+        # Days along the first axis so each step writes one contiguous row
+        log_returns = np.empty((num_days, num_paths))
+        for day in range(num_days):
+            positive = np.maximum(variance, 0.0)
+            diffusion = np.sqrt(positive * dt)
+            price_shock = random.normal(0, 1, num_paths)
+            variance_shock = (self.correlation * price_shock
+                              + np.sqrt(1 - self.correlation**2) * random.normal(0, 1, num_paths))
+            log_returns[day] = (self.drift - 0.5 * positive) * dt + diffusion * price_shock
+            variance += (self.mean_reversion * (self.long_variance - positive) * dt
+                         + self.vol_of_vol * diffusion * variance_shock)
+        return log_returns.T
+
+class BootstrapModel(PathModel):
+    """
+    Block bootstrap over a historical series of daily log-returns.
+
+    Each path is stitched together from blocks of block_size consecutive
+    historical days starting at random points, which keeps the
+    volatility clustering and fat tails of the data within each block.
+    """
+
+    def __init__(self, log_returns, block_size=20):
+        self.log_returns = np.asarray(log_returns, dtype=float)
+        self.block_size = min(block_size, len(self.log_returns))
+        if self.block_size < 1:
+            raise ValueError("Need at least one historical return to bootstrap")
+
+    @classmethod
+    def from_prices(cls, prices, block_size=20):
+        """
+        Model resampling the daily log-returns of a price history
+        """
+        prices = np.asarray(prices, dtype=float)
+        if prices.ndim != 1 or len(prices) < 2:
+            raise ValueError("Need a series of at least two prices")
+        if not np.all(np.isfinite(prices) & (prices > 0)):
+            raise ValueError("Prices must be finite and positive")
+        return cls(np.diff(np.log(prices)), block_size)
+
+    def sample_log_returns(self, num_paths, num_days, random):
+        num_blocks = -(-num_days // self.block_size)
+        high = len(self.log_returns) - self.block_size + 1
+        integers = random.integers if isinstance(random, np.random.Generator) else random.randint
+        starts = integers(0, high, (num_paths, num_blocks))
+        days = (starts[:, :, None] + np.arange(self.block_size)).reshape(num_paths, -1)[:, :num_days]
+        return self.log_returns[days] # Fancy indexing copies, so the history is never modified
+
+class StreamingPathStats:
+    """
+    Running statistics over simulated price paths, fed one chunk at a time.
+
+    Keeps the mean path, per-day probability of loss, and one log-price
+    histogram per day, from which percentile bands, VaR and CVaR are read.
+    Memory depends on time_horizon and bins, never on the number of paths.
+    The histogram range is set from the first chunk with a wide margin,
+    or fixed up front from log_bounds (per-day low and high log prices) so
+    that accumulators fed by different workers can be merged. Values
+    outside the range are counted in the edge bins.
+    """
+
+    def __init__(self, initial_price, time_horizon, bins=1024, log_bounds=None):
+        self.initial_price = initial_price
+        self.bins = bins
+        self.count = 0
+        self.path_sum = np.zeros(time_horizon + 1)
+        self.loss_count = np.zeros(time_horizon + 1)
+        self.final_sum = 0.0
+        self.final_sum_sq = 0.0
+        self.counts = np.zeros((time_horizon + 1, bins), dtype=np.int64)
+        self.final_return_sums = np.zeros(bins)  # For CVaR: sum of final returns in each bin
+        self.low = None
+        self.width = None
+        if log_bounds is not None:
+            self._set_range(*log_bounds, margin=0)
+
+    def _set_range(self, low, high, margin=1):
+        span = np.maximum(high - low, 1e-9)
+        self.low = low - margin * span
+        self.width = (1 + 2 * margin) * span / self.bins
+
+    def update(self, chunk):
+        """
+        Folds a (paths, time_horizon + 1) chunk of prices into the statistics
+        """
+        log_prices = np.log(chunk)
+        if self.low is None:
+            self._set_range(log_prices.min(axis=0), log_prices.max(axis=0))
+        self._update_moments(chunk)
+        final = chunk[:, -1]
+
+        # One bincount for all days: bin index offset by day * bins
+        index = ((log_prices - self.low) / self.width).astype(np.int64)
+        np.clip(index, 0, self.bins - 1, out=index)
+        final_index = index[:, -1].copy()
+        index += np.arange(chunk.shape[1]) * self.bins
+        self.counts += np.bincount(index.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        final_returns = (final - self.initial_price) / self.initial_price
+        self.final_return_sums += np.bincount(final_index, weights=final_returns, minlength=self.bins)
+
+    def merge(self, other):
+        """
+        Adds another accumulator built with the same histogram range
+        """
+        if self.low is None:
+            self.low, self.width = other.low, other.width
+        elif other.low is not None and not (np.array_equal(self.low, other.low)
+                                            and np.array_equal(self.width, other.width)):
+            raise ValueError("Cannot merge statistics with different histogram ranges; pass log_bounds")
+        self._merge_moments(other)
+        self.counts += other.counts
+        self.final_return_sums += other.final_return_sums
+
+    def _update_moments(self, chunk):
+        self.count += chunk.shape[0]
+        self.path_sum += chunk.sum(axis=0)
+        self.loss_count += (chunk < self.initial_price).sum(axis=0)
+        final = chunk[:, -1]
+        self.final_sum += final.sum()
+        self.final_sum_sq += (final ** 2).sum()
+
+    def _merge_moments(self, other):
+        self.count += other.count
+        self.path_sum += other.path_sum
+        self.loss_count += other.loss_count
+        self.final_sum += other.final_sum
+        self.final_sum_sq += other.final_sum_sq
+
+    def _quantile_bins(self, counts, q):
+        """
+        (bin index, fraction of that bin) holding quantile q, per histogram row
+        """
+        cumulative = np.cumsum(counts, axis=-1)
+        target = q * self.count
+        index = np.argmax(cumulative >= target, axis=-1)
+        below = np.take_along_axis(cumulative, index[..., None], axis=-1)[..., 0] - \
+            np.take_along_axis(counts, index[..., None], axis=-1)[..., 0]
+        in_bin = np.take_along_axis(counts, index[..., None], axis=-1)[..., 0]
+        fraction = (target - below) / np.maximum(in_bin, 1)
+        return index, fraction
+
+    def percentile_path(self, percentile):
+        """
+        Price percentile for every day, read from the histograms
+        """
+        index, fraction = self._quantile_bins(self.counts, percentile / 100)
+        return np.exp(self.low + (index + fraction) * self.width)
+
+    def mean_path(self):
+        return self.path_sum / self.count
+
+    def prob_loss(self):
+        """
+        Probability that the price is below the initial price, per day
+        """
+        return self.loss_count / self.count
+
+    def var_cvar(self, confidence_level=0.05):
+        """
+        VaR and CVaR of the final return, matching calculate_var_cvar
+        """
+        final_counts = self.counts[-1]
+        index, fraction = self._quantile_bins(final_counts, confidence_level)
+        var = np.exp(self.low[-1] + (index + fraction) * self.width[-1]) / self.initial_price - 1
+        tail_count = final_counts[:index].sum() + fraction * final_counts[index]
+        tail_sum = self.final_return_sums[:index].sum() + fraction * self.final_return_sums[index]
+        cvar = tail_sum / tail_count if tail_count else var
+        return var, cvar
+
+    def summary(self, confidence_level=0.05, percentiles=(5, 50, 95)):
+        var, cvar = self.var_cvar(confidence_level)
+        mean_final = self.final_sum / self.count
+        return {
+            'num_simulations': self.count,
+            'mean_path': self.mean_path(),
+            'percentiles': {p: self.percentile_path(p) for p in percentiles},
+            'prob_loss': self.prob_loss(),
+            'mean_final_price': mean_final,
+            'std_final_price': np.sqrt(max(self.final_sum_sq / self.count - mean_final ** 2, 0.0)),
+            'var': var,
+            'cvar': cvar,
+        }
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch over many columns at once, in bounded memory.
+
+    A stack of compactors in the style of KLL: level h holds values that
+    each stand for 2**h inputs. When a level grows past k values it is
+    sorted and every other value of its middle part moves up a level with
+    double weight, starting at a random offset so ranks stay unbiased.
+    The lowest and highest k // 4 values of each compaction stay put,
+    which keeps the tails, where VaR and CVaR live, close to exact.
+    Memory is about k values per level and column, with log2(n / k)
+    levels, so it grows only logarithmically with the number of values.
+
+    Values are fed as (n, columns) arrays, e.g. one column per day, or as
+    1-d arrays for a single column. Sketches with the same columns merge
+    by stacking their levels.
+    """
+
+    def __init__(self, k=256, seed=None):
+        self.k = k
+        self.count = 0
+        self.levels = []
+        self.scalar = False
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """
+        Adds a batch of values, rows being observations
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[:, None]
+            self.scalar = True
+        self._add(0, values)
+        self.count += values.shape[0]
+        self._compress()
+
+    def merge(self, other):
+        """
+        Folds another sketch over the same columns into this one
+        """
+        for level, values in enumerate(other.levels):
+            self._add(level, values)
+        self.count += other.count
+        self.scalar = self.scalar or other.scalar
+        self._compress()
+
+    def _add(self, level, values):
+        if level == len(self.levels):
+            self.levels.append(values)
+        else:
+            self.levels[level] = np.concatenate([self.levels[level], values])
+
+    def _compress(self):
+        protected = self.k // 4
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) > self.k:
+                values = np.sort(values, axis=0)
+                # An even-sized middle block is halved; the tails and any odd value stay
+                stop = len(values) - protected
+                stop -= (stop - protected) % 2
+                offset = self.rng.integers(2)
+                self._add(level + 1, values[protected + offset:stop:2])
+                self.levels[level] = np.concatenate([values[:protected], values[stop:]])
+            level += 1
+
+    def _sorted_with_weights(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(values), 2.0 ** level) for level, values in enumerate(self.levels)])
+        order = np.argsort(values, axis=0)
+        return np.take_along_axis(values, order, axis=0), np.cumsum(weights[order], axis=0)
+
+    def _result(self, values):
+        return values[0] if self.scalar else values
+
+    def quantile(self, q):
+        """
+        Estimated q-quantile of each column
+        """
+        values, cumulative = self._sorted_with_weights()
+        index = np.argmax(cumulative >= q * self.count, axis=0)
+        return self._result(values[index, np.arange(values.shape[1])])
+
+    def tail_mean(self, q):
+        """
+        Estimated mean of the lowest fraction q of each column, e.g. CVaR at level q
+        """
+        values, cumulative = self._sorted_with_weights()
+        target = max(q * self.count, 1)
+        # Each value counts with the part of its weight that falls below the target rank
+        clipped = np.minimum(cumulative, target)
+        weights = np.diff(clipped, axis=0, prepend=0)
+        return self._result((weights * values).sum(axis=0) / target)
+
+class SketchPathStats(StreamingPathStats):
+    """
+    StreamingPathStats with per-day quantile sketches in place of histograms.
+
+    Percentile bands, VaR and CVaR come from a QuantileSketch over each
+    day's prices, so no histogram range is needed up front and accumulators
+    from any chunks or workers merge directly.
+    """
+
+    def __init__(self, initial_price, time_horizon, k=256, seed=None):
+        super().__init__(initial_price, time_horizon, bins=0)
+        self.sketch = QuantileSketch(k, seed)
+
+    def update(self, chunk):
+        """
+        Folds a (paths, time_horizon + 1) chunk of prices into the statistics
+        """
+        self._update_moments(chunk)
+        self.sketch.update(chunk)
+
+    def merge(self, other):
+        """
+        Adds another sketch-based accumulator over the same horizon
+        """
+        self._merge_moments(other)
+        self.sketch.merge(other.sketch)
+
+    def percentile_path(self, percentile):
+        return self.sketch.quantile(percentile / 100)
+
+    def var_cvar(self, confidence_level=0.05):
+        """
+        VaR and CVaR of the final return, matching calculate_var_cvar
+        """
+        var = self.sketch.quantile(confidence_level)[-1] / self.initial_price - 1
+        cvar = self.sketch.tail_mean(confidence_level)[-1] / self.initial_price - 1
+        return var, cvar
+
+def simulate_in_chunks(simulate, num_simulations, chunk_size=10_000):
+    """
+    Yields price-path chunks of at most chunk_size rows from simulate(num_paths)
+    """
+    remaining = num_simulations
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        yield simulate(size)
+        remaining -= size
+
+def shard_sizes(num_simulations, num_shards):
+    """
+    Splits num_simulations paths into num_shards near-equal shards
+    """
+    base, extra = divmod(num_simulations, num_shards)
+    return [base + (i < extra) for i in range(num_shards)]
+
+def _map_shards(func, shard_args, use_processes=False):
+    """
+    Runs func once per shard on a thread or process pool, results in shard order
+    """
+    if len(shard_args) == 1:
+        return [func(*shard_args[0])]
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=len(shard_args)) as executor:
+        return list(executor.map(func, *zip(*shard_args)))
+
+def _simulate_shard(model, initial_price, time_horizon, num_paths, seed_sequence):
+    return model.simulate(initial_price, time_horizon, num_paths, np.random.default_rng(seed_sequence))
+
+def simulate_parallel(model, initial_price, time_horizon, num_simulations, seed=None, workers=None,
+                      use_processes=False):
+    """
+    Run any PathModel with its paths sharded across a thread or process pool.
+
+    Every shard draws from its own Generator spawned from SeedSequence(seed),
+    so the streams are independent and the merged paths are identical for a
+    given seed and worker count. Threads fill their rows of one shared array
+    in place (numpy releases the GIL while generating and transforming);
+    processes return their shard to be copied in.
+    """
+    workers = workers or os.cpu_count() or 1
+    seed_sequences = np.random.SeedSequence(seed).spawn(workers)
+    sizes = shard_sizes(num_simulations, workers)
+    if use_processes:
+        shards = _map_shards(_simulate_shard, [
+            (model, initial_price, time_horizon, size, seed_sequence)
+            for size, seed_sequence in zip(sizes, seed_sequences)
+        ], use_processes=True)
+        return np.concatenate(shards)
+
+    simulations = np.empty((num_simulations, time_horizon + 1))
+    starts = np.cumsum([0] + sizes)
+
+    def fill(start, stop, seed_sequence):
+        model.fill_paths(simulations[start:stop], initial_price, np.random.default_rng(seed_sequence))
+
+    _map_shards(fill, list(zip(starts[:-1], starts[1:], seed_sequences)))
     return simulations
 
-def calculate_portfolio_value(initial_investment, simulations, time_horizon):
+def monte_carlo_parallel(initial_price, drift, volatility, time_horizon, num_simulations,
+                         seed=None, workers=None, use_processes=False):
+    """
+    Run the GBM simulation with its paths sharded as in simulate_parallel
+    """
+    return simulate_parallel(GBMModel(drift, volatility), initial_price, time_horizon, num_simulations,
+                             seed, workers, use_processes)
+
+def gbm_log_bounds(initial_price, drift, volatility, time_horizon, num_std=8):
+    """
+    Per-day log-price bounds num_std standard deviations either side of the GBM mean
+    """
+    t = np.arange(time_horizon + 1) / 252
+    mean = np.log(initial_price) + (drift - 0.5 * volatility**2) * t
+    std = volatility * np.sqrt(t)
+    return mean - num_std * std, mean + num_std * std
+
+def _path_stats(initial_price, time_horizon, bins, log_bounds=None, sketch_k=None, seed=None):
+    if sketch_k:
+        return SketchPathStats(initial_price, time_horizon, sketch_k, seed)
+    return StreamingPathStats(initial_price, time_horizon, bins, log_bounds)
+
+def _stream_shard(model, initial_price, time_horizon, num_paths, seed_sequence, chunk_size, bins, log_bounds,
+                  sketch_k=None):
+    path_seed, sketch_seed = seed_sequence.spawn(2)
+    rng = np.random.default_rng(path_seed)
+    stats = _path_stats(initial_price, time_horizon, bins, log_bounds, sketch_k, sketch_seed)
+    for chunk in simulate_in_chunks(
+        lambda n: model.simulate(initial_price, time_horizon, n, rng), num_paths, chunk_size
+    ):
+        stats.update(chunk)
+    return stats
+
+def simulate_streaming(model, initial_price, time_horizon, num_simulations, chunk_size=10_000,
+                       confidence_level=0.05, percentiles=(5, 50, 95), bins=1024,
+                       seed=None, workers=1, use_processes=False, sketch_k=None):
+    """
+    Run any PathModel in fixed-size chunks with bounded memory.
+
+    Each chunk is folded into a StreamingPathStats and discarded, so peak
+    memory is one chunk plus the histograms however many paths are run.
+    With sketch_k, per-day QuantileSketch accumulators of that size replace
+    the histograms (SketchPathStats). With a seed or several workers, paths
+    are sharded as in simulate_parallel and each shard streams into its
+    own statistics, merged in shard order over a shared histogram range
+    from model.log_bounds. Models without one merge sketches instead, with
+    sketch_k defaulting to 256.
+    """
+    if seed is None and workers == 1:
+        stats = _path_stats(initial_price, time_horizon, bins, sketch_k=sketch_k)
+        for chunk in simulate_in_chunks(
+            lambda n: model.simulate(initial_price, time_horizon, n), num_simulations, chunk_size
+        ):
+            stats.update(chunk)
+        return stats.summary(confidence_level, percentiles)
+
+    workers = workers or os.cpu_count() or 1
+    log_bounds = model.log_bounds(initial_price, time_horizon)
+    if log_bounds is None:
+        sketch_k = sketch_k or 256
+    root_seed = np.random.SeedSequence(seed)
+    seed_sequences = root_seed.spawn(workers)
+    shards = _map_shards(_stream_shard, [
+        (model, initial_price, time_horizon, size, seed_sequence, chunk_size, bins, log_bounds, sketch_k)
+        for size, seed_sequence in zip(shard_sizes(num_simulations, workers), seed_sequences)
+    ], use_processes)
+    # The merged sketch compacts too, so it needs its own seeded stream
+    stats = _path_stats(initial_price, time_horizon, bins, log_bounds, sketch_k, root_seed.spawn(1)[0])
+    for shard in shards:
+        stats.merge(shard)
+    return stats.summary(confidence_level, percentiles)
+
+def monte_carlo_streaming(initial_price, drift, volatility, time_horizon, num_simulations,
+                          chunk_size=10_000, confidence_level=0.05, percentiles=(5, 50, 95), bins=1024,
+                          seed=None, workers=1, use_processes=False, sketch_k=None):
+    """
+    Run the GBM simulation in chunks with bounded memory, as in simulate_streaming
+    """
+    return simulate_streaming(GBMModel(drift, volatility), initial_price, time_horizon, num_simulations,
+                              chunk_size, confidence_level, percentiles, bins, seed, workers, use_processes,
+                              sketch_k)
+
+def constant_correlation(num_assets, correlation):
+    """
+    Correlation matrix with the same correlation between every pair of assets
+    """
+    matrix = np.full((num_assets, num_assets), float(correlation))
+    np.fill_diagonal(matrix, 1.0)
+    return matrix
+
+@st.cache_data(show_spinner=False)  # Same correlation on a rerun: reuse the factorisation
+def correlation_cholesky(correlation):
+    """
+    Lower-triangular Cholesky factor of a correlation matrix
+    """
+    correlation = np.asarray(correlation, dtype=float)
+    if correlation.ndim != 2 or correlation.shape[0] != correlation.shape[1]:
+        raise ValueError(f"Correlation matrix must be square, got shape {correlation.shape}")
+    if not (np.allclose(correlation, correlation.T) and np.allclose(np.diag(correlation), 1.0)):
+        raise ValueError("Correlation matrix must be symmetric with a unit diagonal")
+    try:
+        return np.linalg.cholesky(correlation)
+    except np.linalg.LinAlgError:
+        raise ValueError("Correlation matrix must be positive definite") from None
+
+def monte_carlo_multi_asset(initial_prices, drifts, volatilities, correlation, time_horizon, num_simulations,
+                            rng=None, dtype=np.float64):
+    """
+    Run a correlated GBM simulation for several assets at once.
+
+    initial_prices, drifts and volatilities hold one entry per asset and
+    correlation is the (assets, assets) correlation of their daily shocks.
+    Independent normals are correlated with one matrix product against the
+    cached Cholesky factor, then each asset's paths are built in place as
+    in monte_carlo_simulation. Returns an (assets, paths, time_horizon + 1)
+    array of prices in dtype; float32 halves the memory.
+    """
+    dt = 1/252  # Daily time step (252 trading days per year)
+    initial_prices, drifts, volatilities = (np.asarray(values, dtype=float).reshape(-1, 1, 1)
+                                            for values in (initial_prices, drifts, volatilities))
+    cholesky = correlation_cholesky(correlation).astype(dtype)
+    num_assets = cholesky.shape[0]
+    if not initial_prices.size == drifts.size == volatilities.size == num_assets:
+        raise ValueError(f"Expected {num_assets} initial prices, drifts and volatilities")
+
+    shape = (num_assets, num_simulations * time_horizon)
+    if rng is None:
+        shocks = np.random.standard_normal(shape).astype(dtype, copy=False)
+    else:
+        shocks = rng.standard_normal(shape, dtype=dtype)
+
+    # One matrix product correlates the shocks of every path and day
+    log_returns = (cholesky @ shocks).reshape(num_assets, num_simulations, time_horizon)
+    log_returns *= (volatilities * np.sqrt(dt)).astype(dtype)
+    log_returns += ((drifts - 0.5 * volatilities**2) * dt).astype(dtype)
+    simulations = np.empty((num_assets, num_simulations, time_horizon + 1), dtype=dtype)
+    _log_returns_to_prices(simulations, initial_prices.astype(dtype), log_returns)
+    return simulations
+
+def calculate_portfolio_value(initial_investment, simulations, time_horizon, lazy=False):
     """
     Calculate portfolio value over time for different scenarios
+
+    Each path buys initial_investment worth of shares at its starting
+    price. With lazy=True the values are a ScaledPaths view computed on
+    access instead of a second full-size matrix.
     """
-    portfolio_values = np.zeros((simulations.shape[0], time_horizon + 1))
-    
-    for i in range(simulations.shape[0]):
-        # Calculate number of shares that can be bought initially
-        shares = initial_investment / simulations[i, 0]
-        
-        # Portfolio value over time
-        portfolio_values[i, :] = shares * simulations[i, :]
-    
-    return portfolio_values
+    # Number of shares each path can buy initially
+    shares = initial_investment / simulations[:, 0]
+    if lazy:
+        return ScaledPaths(simulations[:, :time_horizon + 1], shares)
+    return simulations[:, :time_horizon + 1] * shares[:, None]
+
+class ScaledPaths:
+    """
+    Price paths times a per-path share count, scaled only when read.
+
+    Indexing returns plain arrays for the selected rows and days, and the
+    mean and min reductions run on the price matrix without materialising
+    the scaled copy; the per-day minimum scales block_rows paths at a
+    time. Share counts are assumed positive.
+    """
+
+    block_rows = 1024
+
+    def __init__(self, simulations, shares):
+        self.simulations = simulations
+        self.shares = shares
+
+    @property
+    def shape(self):
+        return self.simulations.shape
+
+    def __len__(self):
+        return len(self.simulations)
+
+    def __getitem__(self, key):
+        rows = key[0] if isinstance(key, tuple) else key
+        values = self.simulations[key]
+        shares = self.shares[rows]
+        if np.ndim(values) == 2:
+            shares = shares[:, None]
+        return values * shares
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.simulations * self.shares[:, None], dtype=dtype)
+
+    def mean(self, axis=None):
+        """
+        Mean value over paths (axis=0), days (axis=1) or everything
+        """
+        if axis == 0:
+            return self.shares @ self.simulations / len(self.shares)
+        if axis == 1:
+            return self.simulations.mean(axis=1) * self.shares
+        return self.shares @ self.simulations.sum(axis=1) / self.simulations.size
+
+    def min(self, axis=None):
+        """
+        Minimum value over paths (axis=0), days (axis=1) or everything
+        """
+        if axis == 0:
+            # Each path has its own scale, so scale a block of rows at a time
+            day_min = np.full(self.simulations.shape[1], np.inf)
+            for start in range(0, len(self.shares), self.block_rows):
+                rows = slice(start, start + self.block_rows)
+                block = self.simulations[rows] * self.shares[rows, None]
+                np.minimum(day_min, block.min(axis=0), out=day_min)
+            return day_min
+        path_min = self.simulations.min(axis=1) * self.shares
+        return path_min if axis == 1 else path_min.min()
+
+def portfolio_paths(price_paths, weights, initial_investment, rebalance_every=None):
+    """
+    Value paths of a weighted portfolio of assets, optionally rebalanced.
+
+    price_paths is (assets, paths, days) or a single (paths, days) asset.
+    The portfolio starts at the target weights; with rebalance_every it is
+    reset to them every that many days, otherwise it is bought and held.
+    Between rebalances each asset's holding grows with its price relative
+    to the last rebalance day, so one pass per asset covers every period.
+    """
+    price_paths = np.asarray(price_paths)
+    if price_paths.ndim == 2:
+        price_paths = price_paths[None]
+    weights = np.asarray(weights, dtype=float)
+    if weights.shape != price_paths.shape[:1]:
+        raise ValueError(f"Expected {price_paths.shape[0]} weights, got {weights.shape}")
+    weights = weights / weights.sum()
+    num_days = price_paths.shape[2]
+    period = rebalance_every or num_days
+    # Day t is valued against the last rebalance day strictly before it (day 0 against itself)
+    anchor = np.maximum(np.arange(num_days) - 1, 0) // period * period
+
+    growth = np.zeros(price_paths.shape[1:])
+    for weight, prices in zip(weights, price_paths):
+        growth += weight * prices / prices[:, anchor]
+
+    # Value on each rebalance day compounds the growth of the periods before it
+    rebalance_days = np.arange(period, num_days, period)
+    anchor_values = np.ones((growth.shape[0], len(rebalance_days) + 1))
+    np.cumprod(growth[:, rebalance_days], axis=1, out=anchor_values[:, 1:])
+    values = growth * anchor_values[:, anchor // period]
+    values *= initial_investment
+    return values
 
 def calculate_var_cvar(returns, confidence_level=0.05):
     """
@@ -62,6 +909,156 @@ def calculate_var_cvar(returns, confidence_level=0.05):
     
     return var, cvar
 
+def risk_metrics(simulations, initial_price, confidence_level=0.05, percentiles=(5, 50, 95)):
+    """
+    VaR, CVaR, percentile bands, probability of loss and drawdowns for every day at once.
+
+    One np.partition along the path axis places every order statistic the
+    percentiles and VaR need, instead of a full sort per day and per
+    percentile. Percentiles and VaR interpolate like np.percentile, and CVaR
+    is the mean return at or below VaR, as in calculate_var_cvar.
+    VaR and CVaR are returns relative to initial_price.
+    """
+    num_paths, num_days = simulations.shape
+    positions = (num_paths - 1) * np.array([confidence_level] + [p / 100 for p in percentiles])
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, num_paths - 1)
+    ordered = np.partition(simulations, np.unique(np.concatenate([lower, upper])), axis=0)
+    fraction = (positions - lower)[:, None]
+    quantiles = ordered[lower] + fraction * (ordered[upper] - ordered[lower])
+    var_price = quantiles[0]
+
+    # Everything up to the VaR position is at or below it; past it only ties can be
+    cut = lower[0] + 1
+    tail_sum = ordered[:cut].sum(axis=0)
+    tail_count = np.full(num_days, cut)
+    if cut < num_paths:
+        tied = np.flatnonzero(ordered[cut] <= var_price)
+        if tied.size:
+            ties = ordered[cut:, tied]
+            at_or_below = ties <= var_price[tied]
+            tail_sum[tied] += (ties * at_or_below).sum(axis=0)
+            tail_count[tied] += at_or_below.sum(axis=0)
+
+    # Peak-to-trough drawdown of each path, worked out in place on the running peaks
+    running_peak = np.maximum.accumulate(simulations, axis=1)
+    np.divide(simulations, running_peak, out=running_peak)
+    max_drawdown = 1 - running_peak.min(axis=1)
+
+    return {
+        'mean_path': simulations.mean(axis=0),
+        'percentiles': dict(zip(percentiles, quantiles[1:])),
+        'var': var_price / initial_price - 1,
+        'cvar': tail_sum / tail_count / initial_price - 1,
+        'prob_loss': (simulations < initial_price).mean(axis=0),
+        'max_drawdown': max_drawdown,
+    }
+
+def control_variate_weights(controls, expected):
+    """
+    Regression weights that make the weighted mean of controls equal expected.
+
+    Any weighted statistic (quantile, tail mean) then carries the
+    control-variate correction. The weights sum to one and are left
+    unclipped, so the constraint holds exactly; paths far out on the side
+    the sample overweights can get small negative weights, which
+    weighted_var_cvar allows for.
+    """
+    num_paths = len(controls)
+    centered = controls - controls.mean()
+    sum_sq = (centered ** 2).sum()
+    weights = np.full(num_paths, 1 / num_paths)
+    if sum_sq > 0:
+        weights += (expected - controls.mean()) * centered / sum_sq
+    return weights
+
+def weighted_var_cvar(returns, weights, confidence_level=0.05):
+    """
+    VaR and CVaR of returns under per-path weights that sum to one.
+
+    Weights may be negative, as control-variate weights can be, so the
+    cumulative weight is not always increasing: VaR is the first return
+    at which it reaches confidence_level.
+    """
+    order = np.argsort(returns)
+    sorted_returns = returns[order]
+    cumulative = np.cumsum(weights[order])
+    reached = cumulative >= confidence_level
+    index = np.argmax(reached) if reached.any() else len(returns) - 1
+    var = sorted_returns[index]
+    cvar = np.dot(weights[order][:index + 1], sorted_returns[:index + 1]) / cumulative[index]
+    return var, cvar
+
+def _replication_estimate(prices, initial_price, drift, confidence_level, variance_reduction):
+    """
+    Mean final price, VaR and CVaR of the final return over a block of paths.
+
+    The control variate corrects VaR and CVaR only. Its control is the
+    final price itself, so a weighted mean would simply return the
+    analytic expectation; the mean stays the plain sample mean.
+    """
+    final = prices[:, -1]
+    returns = (final - initial_price) / initial_price
+    if variance_reduction == 'control_variate':
+        # Control: the final price, whose GBM expectation is S_0 * exp(drift * T)
+        time_horizon = prices.shape[1] - 1
+        weights = control_variate_weights(final, initial_price * np.exp(drift * time_horizon / 252))
+        var, cvar = weighted_var_cvar(returns, weights, confidence_level)
+    else:
+        var, cvar = calculate_var_cvar(returns, confidence_level)
+    return final.mean(), var, cvar
+
+def replication_estimates(simulations, initial_price, drift, confidence_level=0.05,
+                          variance_reduction=None, replications=20):
+    """
+    Mean final price, VaR and CVaR with their standard errors.
+
+    The estimates use every path. For the standard errors the paths are
+    split into replications contiguous blocks, as produced by
+    monte_carlo_replications, each block gives one estimate, and the
+    spread of those estimates is scaled down to the full sample size.
+    This holds for every variance reduction method as long as the blocks
+    are independent.
+    """
+    starts = np.cumsum([0] + shard_sizes(simulations.shape[0], replications))
+    block_estimates = np.array([
+        _replication_estimate(simulations[start:stop], initial_price, drift, confidence_level,
+                              variance_reduction)
+        for start, stop in zip(starts[:-1], starts[1:])
+    ])
+    estimates = _replication_estimate(simulations, initial_price, drift, confidence_level, variance_reduction)
+    std_errors = block_estimates.std(axis=0, ddof=1) / np.sqrt(replications)
+    return {
+        'mean_final_price': estimates[0],
+        'mean_final_price_se': std_errors[0],
+        'var': estimates[1],
+        'var_se': std_errors[1],
+        'cvar': estimates[2],
+        'cvar_se': std_errors[2],
+    }
+
+def monte_carlo_replications(initial_price, drift, volatility, time_horizon, num_simulations,
+                             variance_reduction=None, replications=20, seed=None, sampling='pseudo'):
+    """
+    Run the GBM simulation as independent replications with a variance reduction method.
+
+    Antithetic pairing and moment matching are applied within each block of
+    paths, so the blocks stay independent and replication_estimates can
+    measure the standard error of any method the same way. With
+    quasi-random sampling every block gets its own scramble, which makes
+    the blocks independent randomized QMC estimates. With 'control_variate'
+    the paths are plain; pass it on to replication_estimates.
+    """
+    rng = np.random.default_rng(seed)
+    if variance_reduction == 'control_variate':
+        variance_reduction = None # Applied to the estimates, not the paths
+    simulations = np.empty((num_simulations, time_horizon + 1))
+    starts = np.cumsum([0] + shard_sizes(num_simulations, replications))
+    for start, stop in zip(starts[:-1], starts[1:]):
+        _fill_gbm_paths(simulations[start:stop], initial_price, drift, volatility, rng, variance_reduction,
+                        sampling)
+    return simulations
+
 def create_simulation_dashboard():
     """
     Main dashboard function for Monte Carlo simulation
@@ -132,6 +1129,39 @@ def create_simulation_dashboard():
             help="Amount to invest initially"
         )
     
+    # Price model, first: the choice decides which of the analysis parameters apply
+    st.sidebar.subheader("🧮 Price Model")
+    
+    model_name = st.sidebar.selectbox(
+        "Model",
+        options=["GBM", "Jump Diffusion", "Heston", "Historical Bootstrap"],
+        help="Variance reduction, quasi-random sampling and multiple assets apply to GBM only"
+    )
+    gbm = model_name == "GBM"
+    
+    price_model = None
+    if model_name == "Jump Diffusion":
+        price_model = MertonJumpModel(
+            drift, volatility,
+            jump_intensity=st.sidebar.slider("Jumps per Year", 0.0, 10.0, 1.0, 0.5),
+            jump_mean=st.sidebar.slider("Mean Jump (%)", -30.0, 10.0, -5.0, 1.0) / 100,
+            jump_std=st.sidebar.slider("Jump Volatility (%)", 0.0, 40.0, 10.0, 1.0) / 100
+        )
+    elif model_name == "Heston":
+        price_model = HestonModel(
+            drift, initial_variance=volatility**2, long_variance=volatility**2,
+            mean_reversion=st.sidebar.slider("Mean Reversion Speed", 0.1, 10.0, 2.0, 0.1),
+            vol_of_vol=st.sidebar.slider("Volatility of Volatility", 0.05, 1.5, 0.5, 0.05),
+            correlation=st.sidebar.slider("Price-Volatility Correlation", -0.95, 0.95, -0.7, 0.05)
+        )
+    elif model_name == "Historical Bootstrap":
+        history_file = st.sidebar.file_uploader(
+            "Price History (CSV)",
+            type="csv",
+            help="Daily prices; uses the 'Close' column if present, otherwise the last numeric column"
+        )
+        block_size = st.sidebar.slider("Block Size (Days)", 1, 60, 20)
+    
     # Advanced parameters
     st.sidebar.subheader("📊 Analysis Parameters")
     
@@ -143,12 +1173,77 @@ def create_simulation_dashboard():
         help="Confidence level for VaR and CVaR calculations"
     )
     
+    num_assets = st.sidebar.slider(
+        "Number of Assets",
+        min_value=1,
+        max_value=20,
+        value=1,
+        disabled=not gbm,
+        help="Simulate an equally weighted portfolio of correlated assets with these parameters (GBM only)"
+    )
+    if not gbm:
+        # A disabled widget still returns its last value
+        num_assets = 1
+    
+    asset_correlation = st.sidebar.slider(
+        "Asset Correlation",
+        min_value=0.0,
+        max_value=0.95,
+        value=0.5,
+        step=0.05,
+        disabled=num_assets == 1,
+        help="Correlation between the daily returns of every pair of assets"
+    )
+    
+    # The multi-asset engine and the other price models draw plain pseudo-random shocks
+    plain_shocks = not gbm or num_assets > 1
+    variance_reduction = st.sidebar.selectbox(
+        "Variance Reduction",
+        options=VARIANCE_REDUCTION_METHODS,
+        format_func=lambda x: "None" if x is None else x.replace('_', ' ').title(),
+        disabled=plain_shocks,
+        help="Technique for tighter estimates with fewer simulations (GBM with a single asset only)"
+    )
+    
+    sampling = st.sidebar.selectbox(
+        "Sampling",
+        options=SAMPLING_METHODS,
+        format_func=lambda x: {'pseudo': "Pseudo-random", 'sobol': "Sobol (quasi-random)",
+                               'halton': "Halton (quasi-random)"}[x],
+        disabled=plain_shocks,
+        help="Quasi-random sequences cover the space more evenly and converge faster "
+             "(GBM with a single asset only)"
+    )
+    if plain_shocks:
+        variance_reduction, sampling = None, 'pseudo'
+    
     show_individual_paths = st.sidebar.checkbox(
         "Show Individual Simulation Paths",
         value=True,
         help="Display individual simulation trajectories"
     )
     
+    # Checked once every widget is drawn, so stopping here keeps the whole sidebar
+    if model_name == "Historical Bootstrap":
+        if history_file is None:
+            st.info("Upload a CSV of daily prices in the sidebar to run the historical bootstrap.")
+            st.stop()
+        try:
+            history = pd.read_csv(history_file)
+            if 'Close' in history:
+                column = history['Close'].dropna()
+            elif history.select_dtypes('number').empty:
+                raise ValueError("No 'Close' or other numeric column found")
+            else:
+                column = history.select_dtypes('number').iloc[:, -1].dropna()
+            prices = pd.to_numeric(column, errors='coerce')
+            if prices.isna().any():
+                raise ValueError(f"Column '{column.name}' has non-numeric values")
+            price_model = BootstrapModel.from_prices(prices.to_numpy(), block_size)
+        except ValueError as e: # Also covers pandas' parser and empty-file errors
+            st.error(f"Cannot use this price history: {e}")
+            st.stop()
+    
     # Run simulation
     if st.sidebar.button("🔄 Run New Simulation", type="primary"):
         st.rerun()
@@ -158,13 +1253,41 @@ def create_simulation_dashboard():
     
     # Run Monte Carlo simulation
     with st.spinner("Running Monte Carlo simulation..."):
-        simulations = monte_carlo_simulation(
-            initial_price, drift, volatility, time_horizon, num_simulations
+        if price_model is not None:
+            simulations = simulate_parallel(price_model, initial_price, time_horizon, num_simulations)
+        elif num_assets > 1:
+            # The portfolio is tracked as an index starting at the initial price, a chunk of paths at a time
+            correlation = constant_correlation(num_assets, asset_correlation)
+            simulations = np.concatenate(list(simulate_in_chunks(
+                lambda n: portfolio_paths(
+                    monte_carlo_multi_asset(
+                        np.full(num_assets, initial_price), np.full(num_assets, drift),
+                        np.full(num_assets, volatility), correlation, time_horizon, n, dtype=np.float32
+                    ),
+                    np.ones(num_assets), initial_price
+                ),
+                num_simulations, chunk_size=1_000
+            )))
+        elif variance_reduction is None and sampling == 'pseudo':
+            simulations = monte_carlo_parallel(
+                initial_price, drift, volatility, time_horizon, num_simulations
+            )
+        else:
+            simulations = monte_carlo_replications(
+                initial_price, drift, volatility, time_horizon, num_simulations, variance_reduction,
+                sampling=sampling
+            )
+        estimates = replication_estimates(
+            simulations, initial_price, drift, confidence_level,
+            variance_reduction if price_model is None else None
         )
         
+        # Per-day risk metrics shared by every tab
+        risk = risk_metrics(simulations, initial_price, confidence_level)
+        
         # Calculate portfolio values
         portfolio_values = calculate_portfolio_value(
-            initial_investment, simulations, time_horizon
+            initial_investment, simulations, time_horizon, lazy=True
         )
         
         # Calculate final returns
@@ -178,11 +1301,12 @@ def create_simulation_dashboard():
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        mean_final_price = np.mean(simulations[:, -1])
+        mean_final_price = estimates['mean_final_price']
         st.metric(
             "Mean Final Price",
             f"${mean_final_price:.2f}",
-            delta=f"{((mean_final_price - initial_price) / initial_price * 100):.1f}%"
+            delta=f"{((mean_final_price - initial_price) / initial_price * 100):.1f}%",
+            help=f"Standard error ${estimates['mean_final_price_se']:.2f}"
         )
     
     with col2:
@@ -194,18 +1318,20 @@ def create_simulation_dashboard():
         )
     
     with col3:
-        var, cvar = calculate_var_cvar(portfolio_returns, confidence_level)
+        # Portfolio returns equal the stock's returns, so the price estimates carry over
+        var, cvar = estimates['var'], estimates['cvar']
         st.metric(
             f"VaR ({confidence_level*100:.0f}%)",
             f"{var*100:.1f}%",
-            help="Value at Risk - worst case scenario"
+            help=f"Value at Risk - worst case scenario (standard error {estimates['var_se']*100:.2f}%)"
         )
     
     with col4:
         st.metric(
             f"CVaR ({confidence_level*100:.0f}%)",
             f"{cvar*100:.1f}%",
-            help="Conditional Value at Risk - expected loss in worst case"
+            help=f"Conditional Value at Risk - expected loss in worst case "
+                 f"(standard error {estimates['cvar_se']*100:.2f}%)"
         )
     
     st.divider()
@@ -240,7 +1366,7 @@ def create_simulation_dashboard():
                 ))
         
         # Add mean path
-        mean_path = np.mean(simulations, axis=0)
+        mean_path = risk['mean_path']
         fig_paths.add_trace(go.Scatter(
             x=time_axis,
             y=mean_path,
@@ -251,8 +1377,8 @@ def create_simulation_dashboard():
         ))
         
         # Add confidence intervals
-        percentile_5 = np.percentile(simulations, 5, axis=0)
-        percentile_95 = np.percentile(simulations, 95, axis=0)
+        percentile_5 = risk['percentiles'][5]
+        percentile_95 = risk['percentiles'][95]
         
         fig_paths.add_trace(go.Scatter(
             x=time_axis,
@@ -299,12 +1425,12 @@ def create_simulation_dashboard():
             ],
             'Value': [
                 f"${np.mean(simulations[:, -1]):.2f}",
-                f"${np.median(simulations[:, -1]):.2f}",
+                f"${risk['percentiles'][50][-1]:.2f}",
                 f"${np.min(simulations[:, -1]):.2f}",
                 f"${np.max(simulations[:, -1]):.2f}",
                 f"${np.std(simulations[:, -1]):.2f}",
-                f"${np.percentile(simulations[:, -1], 5):.2f}",
-                f"${np.percentile(simulations[:, -1], 95):.2f}"
+                f"${percentile_5[-1]:.2f}",
+                f"${percentile_95[-1]:.2f}"
             ]
         }
         
@@ -329,7 +1455,7 @@ def create_simulation_dashboard():
                 ))
         
         # Add mean portfolio path
-        mean_portfolio = np.mean(portfolio_values, axis=0)
+        mean_portfolio = portfolio_values.mean(axis=0)
         fig_portfolio.add_trace(go.Scatter(
             x=time_axis,
             y=mean_portfolio,
@@ -374,7 +1500,7 @@ def create_simulation_dashboard():
                 ],
                 'Value': [
                     f"{np.mean(portfolio_returns)*100:.2f}%",
-                    f"{np.median(portfolio_returns)*100:.2f}%",
+                    f"{(risk['percentiles'][50][-1] / initial_price - 1)*100:.2f}%",
                     f"{np.max(portfolio_returns)*100:.2f}%",
                     f"{np.min(portfolio_returns)*100:.2f}%",
                     f"{np.std(portfolio_returns)*100:.2f}%",
@@ -409,33 +1535,22 @@ def create_simulation_dashboard():
         col1, col2 = st.columns(2)
         
         with col1:
-            # VaR over time
-            var_over_time = []
-            cvar_over_time = []
-            time_points = list(range(0, time_horizon + 1, 30))  # Every 30 days
-            
-            for t in time_points:
-                if t == 0:
-                    var_over_time.append(0)
-                    cvar_over_time.append(0)
-                else:
-                    returns_at_t = (portfolio_values[:, t] - initial_investment) / initial_investment
-                    var, cvar = calculate_var_cvar(returns_at_t, confidence_level)
-                    var_over_time.append(var)
-                    cvar_over_time.append(cvar)
+            # VaR over time, read from the shared per-day risk metrics
+            var_over_time = risk['var']
+            cvar_over_time = risk['cvar']
             
             fig_risk = go.Figure()
             fig_risk.add_trace(go.Scatter(
-                x=time_points,
-                y=[v*100 for v in var_over_time],
-                mode='lines+markers',
+                x=time_axis,
+                y=var_over_time*100,
+                mode='lines',
                 name=f'VaR ({confidence_level*100:.0f}%)',
                 line=dict(color='red', width=2)
             ))
             fig_risk.add_trace(go.Scatter(
-                x=time_points,
-                y=[v*100 for v in cvar_over_time],
-                mode='lines+markers',
+                x=time_axis,
+                y=cvar_over_time*100,
+                mode='lines',
                 name=f'CVaR ({confidence_level*100:.0f}%)',
                 line=dict(color='darkred', width=2)
             ))
@@ -454,7 +1569,7 @@ def create_simulation_dashboard():
             st.subheader("📊 Risk Metrics")
             
             # Calculate various risk metrics
-            max_drawdown = np.min((portfolio_values - initial_investment) / initial_investment)
+            max_drawdown = -risk['max_drawdown'].max()
             volatility_annual = np.std(portfolio_returns) * np.sqrt(252)
             sharpe_ratio = np.mean(portfolio_returns) / np.std(portfolio_returns) * np.sqrt(252)
             
@@ -473,7 +1588,7 @@ def create_simulation_dashboard():
                     f"{max_drawdown*100:.2f}%",
                     f"{volatility_annual*100:.2f}%",
                     f"{sharpe_ratio:.2f}",
-                    f"{np.mean(portfolio_returns < 0)*100:.2f}%"
+                    f"{risk['prob_loss'][-1]*100:.2f}%"
                 ]
             }
             
@@ -1,51 +1,1785 @@
+import asyncio
+import csv
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 'html.parser' and 'lxml' build a BeautifulSoup tree, 'stream' only extracts quote fields
+PARSERS = ('html.parser', 'lxml', 'stream')
+
+
+class _QuoteExtractor(HTMLParser):
+    """Streaming parser that only keeps the text, author, author link and tags of each div.quote."""
+
+    # (tag, class) of the fields we capture inside a quote
+    FIELDS = {'quote': ('span', 'text'), 'author': ('small', 'author')}
+    TAG_LINK = ('a', 'tag') # Each of these adds one entry to the quote's tags
+
+    def __init__(self, page_num, collect_links=False):
+        super().__init__(convert_charrefs=True)
+        self.page_num = page_num
+        self.collect_links = collect_links
+        self.quotes = []
+        self.links = []
+        self._div_depth = 0 # 0 means we are not inside a quote
+        self._current = {}
+        self._field = None
+        self._field_depth = 0
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self.collect_links and tag == 'a' and attrs.get('href'):
+            self.links.append(attrs['href'])
+        classes = (attrs.get('class') or '').split()
+        if not self._div_depth:
+            if tag == 'div' and 'quote' in classes:
+                self._div_depth = 1
+                self._current = {'tags': []}
+            return
+        if (tag == 'a' and attrs.get('href') and 'tag' not in classes
+                and 'author' in self._current and 'author_url' not in self._current):
+            self._current['author_url'] = attrs['href'] # The (about) link after the author
+        if tag == 'div':
+            self._div_depth += 1
+        if self._field:
+            if tag == self._field_tag():
+                self._field_depth += 1
+            return
+        if tag == self.TAG_LINK[0] and self.TAG_LINK[1] in classes:
+            self._field = 'tags'
+            self._field_depth = 1
+            self._parts = []
+            return
+        for field, (field_tag, field_class) in self.FIELDS.items():
+            if tag == field_tag and field_class in classes and field not in self._current:
+                self._field = field
+                self._field_depth = 1
+                self._parts = []
+                break
+
+    def handle_endtag(self, tag):
+        if not self._div_depth:
+            return
+        if self._field and tag == self._field_tag():
+            self._field_depth -= 1
+            if not self._field_depth:
+                if self._field == 'tags':
+                    self._current['tags'].append(''.join(self._parts))
+                else:
+                    self._current[self._field] = ''.join(self._parts)
+                self._field = None
+        if tag == 'div':
+            self._div_depth -= 1
+            if not self._div_depth and all(field in self._current for field in self.FIELDS):
+                text = self._current['quote'].strip().replace('“', '').replace('”', '')
+                self.quotes.append({'author': self._current['author'], 'quote': text, 'page': self.page_num,
+                                    'author_url': self._current.get('author_url'),
+                                    'tags': self._current['tags']})
+
+    def _field_tag(self):
+        """The HTML tag that closes the field being captured."""
+        return self.TAG_LINK[0] if self._field == 'tags' else self.FIELDS[self._field][0]
+
+    def handle_data(self, data):
+        if self._field:
+            self._parts.append(data)
+
+
+class _LinkExtractor(HTMLParser):
+    """Collects the href of every <a> tag."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url, base=None):
+    """Resolves url against base and puts it in a canonical form for deduplication.
+
+    Returns None for links that are not http(s), such as mailto: or javascript:,
+    and for malformed ones, such as a bad port or IPv6 address.
+    """
+    try:
+        if base:
+            url = urljoin(base, url)
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None # One broken link should not abort the crawl
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return None
+    host = (parts.hostname or '').lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f'{host}:{port}'
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, '')) # Drop the #fragment
+
+
+class FingerprintSet:
+    """A set of strings kept as 64-bit hashes in one flat array.
+
+    An open-addressing table of 8-byte slots, kept at most half full, costs
+    about 16-32 bytes per URL instead of the 100+ bytes of a str in a set.
+    Two different URLs sharing a 64-bit hash is possible but vanishingly rare.
+    """
+
+    def __init__(self, capacity=1024):
+        capacity = 1 << max(capacity - 1, 1).bit_length() # Round up to a power of two
+        self._slots = array('Q', bytes(8 * capacity))
+        self._size = 0
+
+    @staticmethod
+    def _fingerprint(value):
+        fingerprint = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+        return fingerprint or 1 # 0 marks an empty slot
+
+    def _find(self, fingerprint):
+        """Index of the slot holding fingerprint, or of the empty slot where it belongs."""
+        slots = self._slots
+        mask = len(slots) - 1
+        index = fingerprint & mask
+        while slots[index] and slots[index] != fingerprint:
+            index = (index + 1) & mask # Linear probing
+        return index
+
+    def _grow(self):
+        old = self._slots
+        self._slots = array('Q', bytes(16 * len(old)))
+        for fingerprint in old:
+            if fingerprint:
+                self._slots[self._find(fingerprint)] = fingerprint
+
+    def add(self, value):
+        """Adds value. Returns False if it was already present."""
+        if (self._size + 1) * 2 > len(self._slots):
+            self._grow()
+        fingerprint = self._fingerprint(value)
+        index = self._find(fingerprint)
+        if self._slots[index]:
+            return False
+        self._slots[index] = fingerprint
+        self._size += 1
+        return True
+
+    def __contains__(self, value):
+        return bool(self._slots[self._find(self._fingerprint(value))])
+
+    def __len__(self):
+        return self._size
+
+
+class CrawlFrontier:
+    """URLs waiting to be crawled, served shallowest first.
+
+    URLs are marked as seen when they are queued, so each one is queued at
+    most once no matter how many pages link to it.
+    """
+
+    def __init__(self, max_depth=3):
+        self.max_depth = max_depth
+        self.seen = FingerprintSet()
+        self._heap = []
+        self._counter = 0 # Keeps discovery order within a depth
+
+    def push(self, url, depth):
+        """Queues url unless it is too deep or was seen before."""
+        if depth > self.max_depth or not self.seen.add(url):
+            return False
+        heapq.heappush(self._heap, (depth, self._counter, url))
+        self._counter += 1
+        return True
+
+    def pop(self):
+        """Returns the next (url, depth)."""
+        depth, _, url = heapq.heappop(self._heap)
+        return url, depth
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class _HostState:
+    """Rate, concurrency and latency bookkeeping for one host."""
+
+    def __init__(self, rate, burst, concurrency):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency # A float, so additive increase can be fractional
+        self.in_flight = 0
+        self.latency = None # Moving average, seconds
+        self.base_latency = None # Fastest recent latency, seconds
+        self.last_decrease = 0.0
+        self.last_increase = 0.0
+        self.condition = threading.Condition()
+
+
+class AdaptiveRateLimiter:
+    """Per-host token buckets plus an adaptive cap on concurrent requests.
+
+    Limits follow AIMD: once per average round trip of fast, successful
+    responses the host's concurrency grows by one and its rate by the same
+    fraction, while a 429, 5xx, error or slow response halves both.
+    Decreases are spaced at least one round trip apart too, so one slow
+    burst is not punished repeatedly.
+
+    A response is slow when the moving average latency exceeds both
+    latency_tolerance times the baseline and latency_floor seconds. The
+    baseline follows new lows at once and drifts up towards the average by
+    baseline_decay per response, so one lucky fast response does not make
+    every later one look slow, and the floor keeps jitter on a fast host
+    from counting as congestion.
+    """
+
+    def __init__(self, rate=5.0, burst=5, min_rate=0.5, max_rate=100.0,
+                 concurrency=4, min_concurrency=1, max_concurrency=32, latency_tolerance=2.0,
+                 latency_floor=0.05, baseline_decay=0.01):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.initial_concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.latency_floor = latency_floor
+        self.baseline_decay = baseline_decay
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = _HostState(self.rate, self.burst, self.initial_concurrency)
+            return self._hosts[host]
+
+    def acquire(self, url):
+        """Waits for a concurrency slot and a token for url's host."""
+        state = self._host(url)
+        with state.condition:
+            while state.in_flight >= int(state.concurrency):
+                state.condition.wait()
+            state.in_flight += 1
+        state.bucket.acquire()
+        return state
+
+    def release(self, state, latency, status):
+        """Frees the slot and adapts the host's limits to how the request went."""
+        with state.condition:
+            state.in_flight -= 1
+            state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+            if state.base_latency is None:
+                state.base_latency = latency
+            else:
+                drifted = state.base_latency + self.baseline_decay * (state.latency - state.base_latency)
+                state.base_latency = min(latency, drifted)
+            slow = state.latency > max(self.latency_tolerance * state.base_latency, self.latency_floor)
+            failed = status is None or status == 429 or status >= 500
+            now = time.monotonic()
+            if failed or slow:
+                if now - state.last_decrease > state.latency:
+                    state.concurrency = max(self.min_concurrency, state.concurrency / 2)
+                    state.bucket.rate = max(self.min_rate, state.bucket.rate / 2)
+                    state.last_decrease = now
+            elif now - state.last_increase > state.latency:
+                growth = min(self.max_concurrency, state.concurrency + 1) / state.concurrency
+                state.concurrency *= growth
+                state.bucket.rate = min(self.max_rate, state.bucket.rate * growth)
+                state.last_increase = now
+            state.condition.notify_all()
+
+    def metrics(self):
+        """Live limits per host."""
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            host: {'rate': state.bucket.rate, 'concurrency': int(state.concurrency),
+                   'in_flight': state.in_flight,
+                   'latency_ms': (state.latency or 0.0) * 1000}
+            for host, state in hosts.items()
+        }
+
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe histogram with fixed buckets, like a Prometheus histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= target and count:
+                return bound
+        return 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+                    'sum': self.sum, 'count': self.count}
+
+
+class CrawlMetrics:
+    """Histograms, counters and gauges describing where crawl time goes.
+
+    Histograms: dns_seconds, connect_seconds (TCP plus TLS), ttfb_seconds,
+    download_seconds and parse_seconds. Counters: response_bytes and
+    responses by status code. Gauges hold current and peak queue depths.
+    Export with prometheus_text(), serve() or write_json().
+    """
+
+    HISTOGRAMS = ('dns_seconds', 'connect_seconds', 'ttfb_seconds', 'download_seconds', 'parse_seconds')
+
+    def __init__(self, namespace='quote_scraper'):
+        self.namespace = namespace
+        self.histograms = {name: Histogram() for name in self.HISTOGRAMS}
+        self.counters = {'response_bytes': 0}
+        self.status_codes = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self._local = threading.local() # Connection setup time of the current request
+        self._server = None
+
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    def count_response(self, status, size):
+        with self._lock:
+            self.status_codes[status] = self.status_codes.get(status, 0) + 1
+            self.counters['response_bytes'] += size
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            _, peak = self.gauges.get(name, (0, 0))
+            self.gauges[name] = (value, max(peak, value))
+
+    def snapshot(self):
+        """All metrics as a JSON-friendly dict."""
+        with self._lock:
+            return {
+                'histograms': {name: h.snapshot() for name, h in self.histograms.items()},
+                'counters': dict(self.counters),
+                'status_codes': {str(code): n for code, n in self.status_codes.items()},
+                'gauges': {name: {'current': v, 'peak': p} for name, (v, p) in self.gauges.items()},
+            }
+
+    def write_json(self, path):
+        """Writes a snapshot to path, replacing the file atomically."""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def prometheus_text(self):
+        """The metrics in the Prometheus text exposition format."""
+        ns = self.namespace
+        snapshot = self.snapshot()
+        lines = []
+        for name, h in snapshot['histograms'].items():
+            lines.append(f'# TYPE {ns}_{name} histogram')
+            cumulative = 0
+            for bound, count in h['buckets'].items():
+                cumulative += count
+                lines.append(f'{ns}_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{ns}_{name}_sum {h["sum"]}')
+            lines.append(f'{ns}_{name}_count {h["count"]}')
+        lines.append(f'# TYPE {ns}_response_bytes_total counter')
+        lines.append(f'{ns}_response_bytes_total {snapshot["counters"]["response_bytes"]}')
+        lines.append(f'# TYPE {ns}_responses_total counter')
+        for code, n in sorted(snapshot['status_codes'].items()):
+            lines.append(f'{ns}_responses_total{{code="{code}"}} {n}')
+        for name, gauge in snapshot['gauges'].items():
+            lines.append(f'# TYPE {ns}_{name} gauge')
+            lines.append(f'{ns}_{name} {gauge["current"]}')
+            lines.append(f'{ns}_{name}_peak {gauge["peak"]}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=9100, host='127.0.0.1'):
+        """Serves prometheus_text() at /metrics from a background thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200 if self.path == '/metrics' else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _TimedConnectionMixin:
+    """Times DNS resolution and connection setup of urllib3 connections."""
+
+    metrics = None # Set on the generated subclasses
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            results = socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        self._dns_time = time.perf_counter() - start
+        self.metrics.observe('dns_seconds', self._dns_time)
+        # Connect to the addresses we just resolved, falling through them in order like
+        # create_connection does; Host and SNI still use the name
+        addresses = list(dict.fromkeys(result[4][0] for result in results))
+        dns_host = self._dns_host
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+            raise error
+        finally:
+            self._dns_host = dns_host
+
+    def connect(self):
+        self._dns_time = 0.0
+        start = time.perf_counter()
+        super().connect()
+        setup = time.perf_counter() - start
+        self.metrics.observe('connect_seconds', setup - self._dns_time)
+        self.metrics._local.setup += setup
+
+
+class _InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report to a CrawlMetrics."""
+
+    def __init__(self, metrics, **kwargs):
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pools = {}
+        for scheme, pool_cls, conn_cls in (('http', HTTPConnectionPool, HTTPConnection),
+                                           ('https', HTTPSConnectionPool, HTTPSConnection)):
+            timed_conn = type(f'Timed{conn_cls.__name__}', (_TimedConnectionMixin, conn_cls),
+                              {'metrics': self.metrics})
+            pools[scheme] = type(f'Timed{pool_cls.__name__}', (pool_cls,), {'ConnectionCls': timed_conn})
+        self.poolmanager.pool_classes_by_scheme = pools
+
+
+class Sink:
+    """Base class for streaming outputs. Buffers records and flushes them in batches."""
+
+    fields = None # The record fields the sink stores, None for all of them
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self._buffer = []
+
+    def write(self, records):
+        """Queues records, flushing whenever a full batch is ready."""
+        self._buffer.extend(records)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes out everything buffered so far."""
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self._buffer = []
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def position(self):
+        """Where the flushed output currently ends, saved by CrawlJournal checkpoints.
+
+        None means the sink cannot roll back, so it cannot be journaled.
+        """
+        return None
+
+    def rollback(self, position):
+        """Discards output written after position."""
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonLinesSink(Sink):
+    """Writes one JSON object per line."""
+
+    def __init__(self, path, batch_size=500):
+        super().__init__(batch_size)
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def _write_batch(self, batch):
+        self.file.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in batch)
+        self.file.flush() # Let readers follow the file while the crawl runs
+
+    def position(self):
+        return self.file.tell()
+
+    def rollback(self, position):
+        self.file.truncate(position)
+        self.file.seek(position)
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class CsvSink(Sink):
+    """Writes records as CSV rows with a header line. Nested values, such as
+    author_details or tags, are written as JSON."""
+
+    FIELDS = ('author', 'quote', 'page')
+    DELTA_FIELDS = ('op',) + FIELDS # For runs with a ChangeDetector
+
+    def __init__(self, path, batch_size=500, fields=FIELDS):
+        super().__init__(batch_size)
+        self.fields = tuple(fields)
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=fields, extrasaction='ignore')
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def _write_batch(self, batch):
+        self.writer.writerows(
+            {field: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+             for field, value in record.items()}
+            for record in batch
+        )
+        self.file.flush()
+
+    def position(self):
+        return self.file.tell()
+
+    def rollback(self, position):
+        self.file.truncate(position)
+        self.file.seek(position)
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class SQLiteSink(Sink):
+    """Inserts records into a SQLite table, one transaction per batch.
+
+    The op column holds the change type of delta records and author_details
+    the enriched author as JSON; both are NULL when a record has no such field.
+    """
+
+    fields = ('author', 'quote', 'page', 'op', 'author_details')
+
+    def __init__(self, path, table='quotes', batch_size=500):
+        super().__init__(batch_size)
+        self.table = table
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} '
+            f'(author TEXT, quote TEXT, page INTEGER, op TEXT, author_details TEXT)'
+        )
+        columns = {row[1] for row in self.connection.execute(f'PRAGMA table_info({table})')}
+        for column in ('op', 'author_details'):
+            if column not in columns: # A table created by an older version
+                self.connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} TEXT')
+
+    def _write_batch(self, batch):
+        with self.connection: # Commits the batch
+            self.connection.executemany(
+                f'INSERT INTO {self.table} (author, quote, page, op, author_details) VALUES (?, ?, ?, ?, ?)',
+                [(r['author'], r['quote'], r['page'], r.get('op'),
+                  json.dumps(r['author_details'], ensure_ascii=False) if r.get('author_details') else None)
+                 for r in batch]
+            )
+
+    def position(self):
+        return self.connection.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM {self.table}').fetchone()[0]
+
+    def rollback(self, position):
+        with self.connection:
+            self.connection.execute(f'DELETE FROM {self.table} WHERE rowid > ?', (position,))
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+
+class ResponseCache:
+    """On-disk cache of pages keyed by URL, used for conditional GETs.
+
+    Each entry keeps the ETag/Last-Modified validators, the compressed body
+    and the records parsed from it, so a 304 needs neither a download nor a
+    re-parse. Entries are evicted least recently used first once the stored
+    bodies exceed max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+            'body BLOB, body_size INTEGER, records TEXT, last_used REAL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)')
+
+    def get(self, url):
+        """Returns the cached entry for url as a dict, or None."""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT etag, last_modified, body_size, records FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body_size, records = row
+        return {'etag': etag, 'last_modified': last_modified, 'body_size': body_size,
+                'records': json.loads(records)}
+
+    def body(self, url):
+        """Returns the cached HTML for url, or None."""
+        with self._lock:
+            row = self.connection.execute('SELECT body FROM responses WHERE url = ?', (url,)).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Request headers that ask the server to answer 304 if nothing changed."""
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def touch(self, url):
+        """Marks an entry as recently used."""
+        with self._lock, self.connection:
+            self.connection.execute('UPDATE responses SET last_used = ? WHERE url = ?', (time.time(), url))
+
+    def put(self, url, response, records):
+        """Stores a 200 response if it carries validators, then evicts down to max_bytes."""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return # Nothing to revalidate with
+        body = response.content
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, zlib.compress(body), len(body), json.dumps(records), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        """Drops least recently used entries until the cache fits in max_bytes."""
+        total = self.connection.execute('SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self.connection.execute(
+                'SELECT url, LENGTH(body) FROM responses ORDER BY last_used').fetchall():
+            self.connection.execute('DELETE FROM responses WHERE url = ?', (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        self.connection.close()
+
+
+class CrawlJournal:
+    """Durable record of a crawl's progress, so an interrupted crawl can resume.
+
+    Completed pages and their records are committed in one transaction
+    together with the position of every sink, after those sinks have been
+    flushed. On resume the sinks are rolled back to that checkpoint, which
+    drops anything written after it, and the crawl continues with the first
+    page that was not committed. Output therefore holds every page exactly
+    once.
+    """
+
+    def __init__(self, path, checkpoint_every=10):
+        self.checkpoint_every = checkpoint_every
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS pages (page INTEGER PRIMARY KEY, records TEXT)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS sink_positions (sink INTEGER PRIMARY KEY, position TEXT)')
+        self._pending = []
+
+    def completed_pages(self):
+        """Number of pages committed so far. Pages are always completed in order."""
+        return self.connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def records(self):
+        """Yields the committed records in page order."""
+        for (records,) in self.connection.execute('SELECT records FROM pages ORDER BY page'):
+            yield from json.loads(records)
+
+    def restore(self, sinks):
+        """Rolls sinks back to the last checkpoint, or records their start positions on a new crawl.
+
+        Raises ValueError if a sink has no position() to roll back to: after
+        a crash it would keep the records of pages the journal never
+        committed, and the resumed crawl would write them again.
+        """
+        unsupported = [type(sink).__name__ for sink in sinks if sink.position() is None]
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} cannot roll back, so it cannot be used with a CrawlJournal")
+        positions = dict(self.connection.execute('SELECT sink, position FROM sink_positions'))
+        if not positions:
+            self._save_positions(sinks)
+            self.connection.commit()
+            return
+        for index, sink in enumerate(sinks):
+            if index in positions:
+                sink.rollback(json.loads(positions[index]))
+
+    def _save_positions(self, sinks):
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO sink_positions VALUES (?, ?)',
+            [(index, json.dumps(sink.position())) for index, sink in enumerate(sinks)]
+        )
+
+    def add_page(self, page, records, sinks):
+        """Queues a collected page, checkpointing every checkpoint_every pages."""
+        self._pending.append((page, json.dumps(records)))
+        if len(self._pending) >= self.checkpoint_every:
+            self.checkpoint(sinks)
+
+    def checkpoint(self, sinks):
+        """Flushes the sinks, then commits the queued pages with the new sink positions."""
+        for sink in sinks:
+            sink.flush()
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO pages VALUES (?, ?)', self._pending)
+            self._save_positions(sinks)
+        self._pending = []
+
+    def close(self):
+        self.connection.close()
+
+
+class ChangeDetector:
+    """Persisted content fingerprints for incremental runs.
+
+    Each page's body hash is stored with the records parsed from it, so a
+    page whose body hash is unchanged skips parsing. Each record is keyed by
+    its author and quote text and stored with a hash of the whole record.
+    Comparing a run against the store turns it into a delta stream:
+    'insert' for new quotes, 'update' for known quotes whose record changed
+    (e.g. it moved page), and 'delete' for quotes not seen this run.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            'CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, body_hash TEXT, records TEXT);'
+            'CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, record_hash TEXT, record TEXT, seen_run INTEGER);'
+            'CREATE TABLE IF NOT EXISTS runs (run INTEGER PRIMARY KEY);'
+        )
+        self.run = None
+
+    @staticmethod
+    def body_hash(body):
+        return hashlib.sha256(body).hexdigest()
+
+    @staticmethod
+    def _record_key(record):
+        return hashlib.sha1(f"{record['author']}\0{record['quote']}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _record_hash(record):
+        return hashlib.sha1(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def start_run(self):
+        """Begins a new run; records not seen before finish_run() count as deleted."""
+        with self._lock, self.connection:
+            self.run = self.connection.execute('INSERT INTO runs DEFAULT VALUES').lastrowid
+
+    def unchanged_records(self, url, body_hash):
+        """The stored records of url if its body hash is unchanged, otherwise None."""
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT records FROM pages WHERE url = ? AND body_hash = ?', (url, body_hash)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def diff(self, url, records, body_hash=None):
+        """Compares a page's records with the store and returns the deltas.
+
+        body_hash is the hash of a freshly parsed body. Without it the page
+        was unchanged (or served from cache) and its records only need to be
+        marked as seen.
+        """
+        with self._lock, self.connection:
+            known_page = self.connection.execute('SELECT 1 FROM pages WHERE url = ?', (url,)).fetchone()
+            if body_hash is None and known_page:
+                self.connection.executemany(
+                    'UPDATE records SET seen_run = ? WHERE key = ?',
+                    [(self.run, self._record_key(record)) for record in records]
+                )
+                return []
+            deltas = []
+            for record in records:
+                key, record_hash = self._record_key(record), self._record_hash(record)
+                row = self.connection.execute('SELECT record_hash FROM records WHERE key = ?', (key,)).fetchone()
+                if row is None or row[0] != record_hash:
+                    deltas.append({'op': 'insert' if row is None else 'update', **record})
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)',
+                    (key, record_hash, json.dumps(record), self.run)
+                )
+            if body_hash is not None:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO pages VALUES (?, ?, ?)', (url, body_hash, json.dumps(records))
+                )
+            return deltas
+
+    def finish_run(self):
+        """Removes and returns, as deletions, the records this run did not see."""
+        with self._lock, self.connection:
+            rows = self.connection.execute(
+                'SELECT record FROM records WHERE seen_run < ?', (self.run,)
+            ).fetchall()
+            self.connection.execute('DELETE FROM records WHERE seen_run < ?', (self.run,))
+        return [{'op': 'delete', **json.loads(record)} for (record,) in rows]
+
+    def close(self):
+        self.connection.close()
+
+
+def parse_quotes(html, page_num, parser='html.parser', links=None):
+    """Extracts the quotes from a page's HTML with the given parser backend.
+
+    A module-level function so it can run in parser worker processes.
+    If a links list is given, every href on the page is appended to it.
+    Each record's 'author_url' is the href of its (about) link as written
+    on the page, usually relative, or None if the quote has no such link.
+    'tags' lists the text of the quote's a.tag links in page order.
+    """
+    if parser == 'stream':
+        # Quotes and links in a single pass
+        extractor = _QuoteExtractor(page_num, collect_links=links is not None)
+        extractor.feed(html)
+        extractor.close()
+        if links is not None:
+            links.extend(extractor.links)
+        return extractor.quotes
+
+    if links is not None:
+        link_extractor = _LinkExtractor()
+        link_extractor.feed(html)
+        link_extractor.close()
+        links.extend(link_extractor.links)
+
+    # Only build the tree for the quote divs, not the whole page
+    soup = BeautifulSoup(html, parser, parse_only=SoupStrainer('div', class_='quote'))
+
+    # The below code you could modify to suit your needs
+    page_quotes = []
+    for quote in soup.find_all('div', class_='quote'):
+        text = quote.find('span', class_='text').text.strip().replace('“', '').replace('”', '')
+        author = quote.find('small', class_='author')
+        about = author.find_next_sibling('a', href=True)
+        page_quotes.append({'author': author.text, 'quote': text, 'page': page_num,
+                            'author_url': about['href'] if about else None,
+                            'tags': [tag.text for tag in quote.find_all('a', class_='tag')]})
+        
+    return page_quotes
+
+
+class WorkQueue:
+    """Numbered pages leased to scraper workers from a shared SQLite file.
+
+    A worker leases a page for visibility_timeout seconds. If it crashes
+    before committing, the lease expires and another worker picks the page
+    up. Commits are idempotent: the first result for a page wins and later
+    ones, e.g. from a worker whose lease had expired, are ignored. An empty
+    page cancels the pages after it, mirroring run_scraper's stop rule. A
+    page that could not be fetched is released back to the queue, and marked
+    failed once it has been leased max_attempts times; enqueueing it again
+    gives it a fresh set of attempts.
+    """
+
+    def __init__(self, path, visibility_timeout=60, max_attempts=3):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        # Autocommit mode; writes use explicit BEGIN IMMEDIATE transactions
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL') # Readers don't block the writer
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks (page INTEGER PRIMARY KEY, state TEXT NOT NULL DEFAULT 'pending', "
+            "owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, records TEXT)"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        self.connection.execute('BEGIN IMMEDIATE') # Take the write lock up front
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def enqueue(self, pages):
+        """Adds page numbers. Pages already queued are left alone, except failed
+        ones, which are retried, so this is safe to repeat."""
+        with self._transaction() as db:
+            db.executemany('INSERT OR IGNORE INTO tasks (page) VALUES (?)', [(page,) for page in pages])
+            db.execute("UPDATE tasks SET state = 'pending', attempts = 0 WHERE state = 'failed'")
+
+    def lease(self, owner, count=1):
+        """Claims up to count pending or expired pages for owner, lowest first."""
+        now = time.time()
+        with self._transaction() as db:
+            pages = [page for (page,) in db.execute(
+                "SELECT page FROM tasks WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY page LIMIT ?", (now, count)
+            )]
+            db.executemany(
+                "UPDATE tasks SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE page = ?", [(owner, now + self.visibility_timeout, page) for page in pages]
+            )
+        return pages
+
+    def commit(self, page, owner, records):
+        """Stores a page's records. Returns False if the page was already finished."""
+        with self._transaction() as db:
+            row = db.execute('SELECT state FROM tasks WHERE page = ?', (page,)).fetchone()
+            if row is None or row[0] in ('done', 'skipped'):
+                return False
+            db.execute("UPDATE tasks SET state = 'done', owner = ?, records = ? WHERE page = ?",
+                       (owner, json.dumps(records), page))
+            if not records:
+                # Nothing after an empty page is needed
+                db.execute("UPDATE tasks SET state = 'skipped' WHERE page > ? AND state IN ('pending', 'leased')",
+                           (page,))
+        return True
+
+    def release(self, page, owner):
+        """Gives back a page owner could not fetch, or marks it failed after max_attempts leases."""
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_expires = NULL WHERE page = ? AND state = 'leased' AND owner = ?",
+                (self.max_attempts, page, owner)
+            )
+
+    def failed(self):
+        """Page numbers that ran out of attempts."""
+        return [page for (page,) in self.connection.execute(
+            "SELECT page FROM tasks WHERE state = 'failed' ORDER BY page")]
+
+    def unfinished(self):
+        """Number of pages still pending or leased."""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')"
+        ).fetchone()[0]
+
+    def results(self):
+        """Yields each committed page as (page, records) in order.
+
+        Stops before the first gap, e.g. a failed page, and after the first
+        empty page, which is yielded so callers can tell the crawl reached
+        the end of the site.
+        """
+        expected = None
+        for page, records in self.connection.execute(
+                "SELECT page, records FROM tasks WHERE state = 'done' ORDER BY page"):
+            records = json.loads(records)
+            if expected is not None and page != expected:
+                return
+            yield page, records
+            if not records:
+                return
+            expected = page + 1
+
+    def close(self):
+        self.connection.close()
+
+
+def _worker_main(base_url, queue_path, visibility_timeout, max_attempts, scraper_kwargs, concurrency):
+    """Entry point of a worker process started by QuoteScraper.run_distributed."""
+    scraper = QuoteScraper(base_url, **scraper_kwargs)
+    queue = WorkQueue(queue_path, visibility_timeout, max_attempts)
+    try:
+        scraper.run_worker(queue, concurrency=concurrency)
+    finally:
+        queue.close()
+        scraper.close()
+
+
+def author_slug(name):
+    """The path segment of an author's page, e.g. 'J.K. Rowling' -> 'J-K-Rowling'.
+
+    Only a fallback for records without an 'author_url'; the link on the page
+    is authoritative.
+    """
+    name = name.replace("'", '').replace('’', '') # "Madeleine L'Engle" -> 'Madeleine-LEngle'
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^A-Za-z0-9]+', '-', ascii_name).strip('-')
+
+
+def parse_author(html, parser='html.parser'):
+    """Extracts the details block of an author page, or None if there is none."""
+    soup = BeautifulSoup(html, 'html.parser' if parser == 'stream' else parser,
+                         parse_only=SoupStrainer('div', class_='author-details'))
+    details = soup.find('div', class_='author-details')
+    if not details:
+        return None
+    fields = {'born_date': ('span', 'author-born-date'), 'born_location': ('span', 'author-born-location'),
+              'description': ('div', 'author-description')}
+    result = {}
+    for field, (tag, css_class) in fields.items():
+        node = details.find(tag, class_=css_class)
+        result[field] = node.text.strip() if node else None
+    return result
+
+
+class AuthorEnricher:
+    """Adds the details from each author's bio page to quote records.
+
+    Author pages are memoised in an LRU cache whose entries expire after
+    ttl seconds. Failed fetches are cached for failure_ttl seconds only, so
+    a bad page is not hammered but a transient error does not hide an
+    author for a whole day. Concurrent lookups of the same page share one request
+    instead of each fetching it. enrich() fetches all the authors missing
+    from a batch of records in parallel, so the number of requests grows
+    with distinct authors rather than quotes.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, scraper, ttl=24 * 3600, failure_ttl=60, max_entries=10000, batch_size=16):
+        self.scraper = scraper
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict() # url -> (expires at, details)
+        self._in_flight = {} # url -> Future shared by everyone waiting for it
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=batch_size)
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def author_url(self, record):
+        """The absolute URL of a record's author page, taken from its (about) link."""
+        if record.get('author_url'):
+            return urljoin(self.scraper.base_url + '/', record['author_url'])
+        return f"{self.scraper.base_url}/author/{author_slug(record['author'])}" # e.g. records cached by older runs
+
+    def _lookup(self, url):
+        """Cached details for url, or _MISSING. Call with the lock held."""
+        entry = self._cache.get(url)
+        if entry is None:
+            return self._MISSING
+        expires, details = entry
+        if expires < time.monotonic():
+            del self._cache[url]
+            return self._MISSING
+        self._cache.move_to_end(url) # Most recently used
+        return details
+
+    def _store(self, url, details):
+        """Caches details, evicting least recently used entries. Call with the lock held."""
+        ttl = self.ttl if details is not None else self.failure_ttl
+        self._cache[url] = (time.monotonic() + ttl, details)
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def get(self, url):
+        """Details from one author page, fetching it at most once at a time."""
+        with self._lock:
+            details = self._lookup(url)
+            if details is not self._MISSING:
+                self.stats['hits'] += 1
+                return details
+            future = self._in_flight.get(url)
+            owner = future is None
+            if owner:
+                future = self._in_flight[url] = Future()
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result() # Someone else is already fetching this page
+
+        try:
+            response = self.scraper._fetch_page(url)
+            details = parse_author(response.text, self.scraper.parser) if response is not None else None
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[url]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._store(url, details) # Failures too, briefly, so a bad page is not hammered
+            del self._in_flight[url]
+        future.set_result(details)
+        return details
+
+    def enrich(self, records):
+        """Returns copies of records with an 'author_details' field."""
+        urls = [self.author_url(record) for record in records]
+        with self._lock:
+            missing = [url for url in set(urls) if self._lookup(url) is self._MISSING]
+        details = dict(zip(missing, self._executor.map(self.get, missing)))
+        enriched = []
+        for record, url in zip(records, urls):
+            author_details = details[url] if url in details else self.get(url)
+            enriched.append({**record, 'author_details': author_details})
+        return enriched
+
+    def close(self):
+        self._executor.shutdown()
+
 
 class QuoteScraper:
     """A class designed to scrape quotes from quotes.toscrape.com."""
     
-    def __init__(self, base_url):
+    def __init__(self, base_url, pool_size=10, timeout=(3.05, 10), max_retries=3, backoff_factor=0.5,
+                 parser='html.parser', cache=None, rate_limiter=None, changes=None, enrich_authors=False,
+                 metrics=None):
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser {parser!r}, expected one of {PARSERS}")
         self.base_url = base_url
+        self.parser = parser
+        self.cache = cache # Optional ResponseCache for conditional GETs
+        self.rate_limiter = rate_limiter # Optional AdaptiveRateLimiter for politeness
+        self.changes = changes # Optional ChangeDetector: emit only inserts, updates and deletions
+        self.enricher = AuthorEnricher(self) if enrich_authors else None
+        self.metrics = metrics # Optional CrawlMetrics for timing histograms and queue depths
+        self._page_hashes = {}
+        self._stop_reason = None # 'empty' or 'fetch_failed' once a crawl stops before max_pages
         self.all_data = []
+        self.sinks = []
+        self.journal = None
+        self.total_quotes = 0
+        self.timeout = timeout # (connect, read) seconds
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        # One pooled session so pages reuse keep-alive connections
+        self.session = requests.Session()
+        if metrics:
+            adapter = _InstrumentedAdapter(metrics, pool_connections=pool_size, pool_maxsize=pool_size)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        """Clears the per-crawl counters."""
+        self.stats = {'requests': 0, 'retries': 0, 'new_connections': 0, 'reused_connections': 0,
+                      'cache_hits': 0, 'cache_misses': 0, 'bytes_saved': 0,
+                      'unchanged_pages': 0, 'inserts': 0, 'updates': 0, 'deletes': 0}
 
-    def _fetch_page(self, url):
-        """Private method to fetch and parse HTML."""
+    def _check_sinks(self, sinks):
+        """Raises ValueError if a sink would silently drop a field this scraper emits."""
+        required = (['op'] if self.changes else []) + (['author_details'] if self.enricher else [])
+        for sink in sinks:
+            missing = [field for field in required if sink.fields is not None and field not in sink.fields]
+            if missing:
+                raise ValueError(f"{type(sink).__name__} would drop the field(s) {', '.join(map(repr, missing))}; "
+                                 f"pass a sink that stores them, e.g. a CsvSink with them in its fields")
+
+    def _count(self, name, amount=1):
+        """Thread-safe increment of a per-crawl counter."""
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _connections_opened(self):
+        """Total connections opened so far by the session's connection pools."""
+        total = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    total += pool.num_connections
+        return total
+
+    def _backoff(self, attempt, response=None):
+        """Exponential backoff with full jitter, honouring a numeric Retry-After.
+
+        Retry-After is capped at the longest backoff of the retry schedule, so a
+        server asking for hours cannot stall a worker thread for that long.
+        """
+        delay = random.uniform(0, self.backoff_factor * 2 ** attempt)
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(int(retry_after), self.backoff_factor * 2 ** self.max_retries))
+        return delay
+
+    def _request(self, url, headers=None):
+        """One GET request, timed phase by phase when there are metrics."""
+        if not self.metrics:
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+        self.metrics._local.setup = 0.0 # Filled in if this request opens a connection
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            self.metrics.count_response('error', 0)
+            raise
+        total = time.perf_counter() - start
+        headers_at = response.elapsed.total_seconds() # requests measures up to the response headers
+        self.metrics.observe('ttfb_seconds', max(headers_at - self.metrics._local.setup, 0.0))
+        self.metrics.observe('download_seconds', max(total - headers_at, 0.0))
+        self.metrics.count_response(response.status_code, len(response.content))
+        return response
+
+    def _send(self, url, headers=None):
+        """One GET request, throttled by the rate limiter if there is one."""
+        if not self.rate_limiter:
+            return self._request(url, headers)
+        state = self.rate_limiter.acquire(url)
+        status = None
+        start = time.perf_counter()
+        try:
+            response = self._request(url, headers)
+            status = response.status_code
+            return response
+        finally:
+            self.rate_limiter.release(state, time.perf_counter() - start, status)
+
+    def _get(self, url, headers=None):
+        """GET with timeouts, retrying on 429/5xx and connection errors."""
+        for attempt in range(self.max_retries + 1):
+            response = None
+            self._count('requests')
+            try:
+                response = self._send(url, headers)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            self._count('retries')
+            time.sleep(self._backoff(attempt, response))
+
+    def close(self):
+        """Closes the pooled HTTP session."""
+        if self.enricher:
+            self.enricher.close()
+        self.session.close()
+
+    def _fetch_page(self, url, headers=None):
+        """Private method to fetch a page. Returns the response, or None on error."""
         try:
-            response = requests.get(url)
+            response = self._get(url, headers)
             response.raise_for_status() # Check for bad status codes
-            return BeautifulSoup(response.text, 'html.parser')
+            return response
         except requests.exceptions.RequestException as e:
             print(f"Error fetching {url}: {e}")
             return None
 
-    def scrape_page(self, page_num):
-        """Scrapes data from a single, numbered page."""
-        url = f'{self.base_url}/page/{page_num}/'
-        soup = self._fetch_page(url)
+    def _parse_page(self, html, page_num, links=None):
+        """Extracts the quotes from a page's HTML with the selected parser backend."""
+        if not self.metrics:
+            return parse_quotes(html, page_num, self.parser, links)
+        start = time.perf_counter()
+        page_quotes = parse_quotes(html, page_num, self.parser, links)
+        self.metrics.observe('parse_seconds', time.perf_counter() - start)
+        return page_quotes
+
+    def _page_url(self, page_num):
+        return f'{self.base_url}/page/{page_num}/'
+
+    def _download_page(self, page_num):
+        """Fetches a numbered page.
+
+        Returns (None, None) if the page could not be fetched, (records, None)
+        when there is nothing to parse, i.e. on cache hits, otherwise
+        (None, response).
+        """
+        url = self._page_url(page_num)
+        cached = self.cache.get(url) if self.cache else None
+        response = self._fetch_page(url, ResponseCache.conditional_headers(cached))
         
-        if not soup:
-            return [] # Return empty list on error
-
-        # The below code you could modify to suit your needs
-        page_quotes = []
-        for quote in soup.find_all('div', class_='quote'):
-            text = quote.find('span', class_='text').text.strip().replace('“', '').replace('”', '')
-            author = quote.find('small', class_='author').text
-            page_quotes.append({'author': author, 'quote': text, 'page': page_num})
-            
+        if response is None:
+            return None, None # Unlike [], which is a real empty page
+
+        if response.status_code == 304 and cached:
+            # Unchanged since the last run: reuse the stored records without parsing
+            self.cache.touch(url)
+            self._count('cache_hits')
+            self._count('bytes_saved', cached['body_size'])
+            return cached['records'], None
+
+        if self.changes:
+            body_hash = ChangeDetector.body_hash(response.content)
+            stored = self.changes.unchanged_records(url, body_hash)
+            if stored is not None:
+                self._count('unchanged_pages')
+                return stored, None # Same bytes as last run: no need to parse
+            self._page_hashes[url] = body_hash
+
+        return None, response
+
+    def _cache_page(self, page_num, response, page_quotes):
+        """Stores a freshly parsed page in the response cache, if there is one."""
+        if self.cache:
+            self._count('cache_misses')
+            self.cache.put(self._page_url(page_num), response, page_quotes)
+
+    def scrape_page(self, page_num):
+        """Scrapes data from a single, numbered page. Returns None if it could not be fetched."""
+        records, response = self._download_page(page_num)
+        if response is None:
+            return records
+
+        page_quotes = self._parse_page(response.text, page_num)
+        self._cache_page(page_num, response, page_quotes)
+        return page_quotes
+
+    async def _scrape_in_pipeline(self, page_num, executor, parse_pool, parse_slots):
+        """Downloads a page on a thread, then parses it in a worker process.
+
+        A parse slot is taken before the download starts and held until the
+        page is parsed, so fetched but unparsed pages can never outnumber
+        the slots, however far ahead the fetch window runs.
+        """
+        loop = asyncio.get_running_loop()
+        async with parse_slots: # Backpressure: no new download while the parse queue is full
+            records, response = await loop.run_in_executor(executor, self._download_page, page_num)
+            if response is None:
+                return records
+            self._parse_backlog += 1
+            self._set_gauge('parse_queue', self._parse_backlog)
+            try:
+                start = time.perf_counter()
+                page_quotes = await loop.run_in_executor(parse_pool, parse_quotes, response.text, page_num, self.parser)
+                if self.metrics:
+                    # Includes the hand-off to the worker process
+                    self.metrics.observe('parse_seconds', time.perf_counter() - start)
+            finally:
+                self._parse_backlog -= 1
+                self._set_gauge('parse_queue', self._parse_backlog)
+        self._cache_page(page_num, response, page_quotes)
         return page_quotes
 
-    def run_scraper(self, max_pages=5):
-        """Runs the scraper for a specified number of pages."""
+    def _set_gauge(self, name, value):
+        if self.metrics:
+            self.metrics.set_gauge(name, value)
+
+    def _emit(self, records):
+        """Sends records to the sinks, or to all_data when there are none."""
+        if self.sinks:
+            for sink in self.sinks:
+                sink.write(records)
+        else:
+            self.all_data.extend(records)
+
+    def _emit_deltas(self, deltas):
+        """Emits change records and counts them by operation."""
+        for delta in deltas:
+            self.stats[delta['op'] + 's'] += 1
+        self._emit(deltas)
+
+    def _finish_changes(self):
+        """Emits the deletions of a change-detection run, if it reached the last page of the site."""
+        if not self.changes:
+            return
+        # Records on the pages we never reached are not gone, just unseen
+        if self._stop_reason == 'fetch_failed':
+            print("Not emitting deletions: the crawl stopped on a page that could not be fetched.")
+            return
+        if self._stop_reason != 'empty':
+            print("Not emitting deletions: the crawl stopped at max_pages before reaching an empty page.")
+            return
+        self._emit_deltas(self.changes.finish_run())
+
+    def _collect_page(self, page, data):
+        """Stores the quotes of one page. Returns False when the crawl should stop."""
+        if data is None:
+            print(f"Could not fetch page {page}. Stopping.")
+            self._stop_reason = 'fetch_failed'
+            return False
+        if not data:
+            print(f"No data found on page {page}. Stopping.")
+            self._stop_reason = 'empty'
+            return False
+        if self.enricher:
+            data = self.enricher.enrich(data)
+        if self.changes:
+            url = self._page_url(page)
+            self._emit_deltas(self.changes.diff(url, data, self._page_hashes.pop(url, None)))
+        else:
+            self._emit(data)
+        if self.journal:
+            self.journal.add_page(page, data, self.sinks)
+        self.total_quotes += len(data)
+        print(f"Collected {len(data)} quotes from page {page}.")
+        return True
+
+    async def _run_async(self, first_page, max_pages, concurrency, parse_pool=None, parse_queue_size=0):
+        """Fetches up to `concurrency` pages at once but collects them in page order."""
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        parse_slots = asyncio.Semaphore(parse_queue_size) if parse_pool else None
+        self._parse_backlog = 0 # Downloaded pages waiting for or being parsed
+        in_flight = {}
+        next_page = first_page
+        try:
+            for page in range(first_page, max_pages + 1):
+                # Keep a window of pages ahead of the one we are waiting for
+                while next_page <= max_pages and len(in_flight) < concurrency:
+                    if parse_pool:
+                        in_flight[next_page] = asyncio.ensure_future(
+                            self._scrape_in_pipeline(next_page, executor, parse_pool, parse_slots))
+                    else:
+                        in_flight[next_page] = loop.run_in_executor(executor, self.scrape_page, next_page)
+                    next_page += 1
+                self._set_gauge('pages_in_flight', len(in_flight))
+                data = await in_flight.pop(page)
+                if not self._collect_page(page, data):
+                    break
+        finally:
+            for future in in_flight.values():
+                future.cancel()
+            # Drop queued pages but let running downloads finish, so none of them
+            # touches the cache or the page hashes after the crawl has returned
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._page_hashes.clear()
+
+    def run_scraper(self, max_pages=5, concurrency=1, sinks=None, journal=None, parse_workers=0):
+        """Runs the scraper for a specified number of pages.
+
+        With concurrency > 1 pages are fetched in parallel through asyncio,
+        while all_data keeps page order and the crawl still stops at the
+        first empty page.
+
+        If sinks are given, records are streamed to them in page order
+        instead of being kept in all_data. Sinks are flushed, not closed,
+        when the crawl ends.
+
+        With a CrawlJournal the crawl resumes after the last page the
+        journal committed, restoring all_data and rolling sinks back so no
+        record is written twice.
+
+        With parse_workers > 0, fetched pages are parsed in that many worker
+        processes. At most two pages per worker are being downloaded or
+        waiting to be parsed; once that queue is full, no new download
+        starts until a worker frees up.
+
+        With a ChangeDetector (the `changes` argument of QuoteScraper), only
+        deltas are emitted: records with an 'op' of insert, update or delete.
+        Deletions are only emitted when the crawl reaches an empty page, the
+        end of the site; a crawl that stops at max_pages or on a page it
+        could not fetch has not seen every quote. Every sink must store the
+        'op' field, and such a run cannot be resumed from a journal: the
+        deltas emitted before an interruption are not journaled, so a
+        resumed run would report them wrongly.
+        """
+        if journal and self.changes:
+            raise ValueError("run_scraper cannot combine a CrawlJournal with a ChangeDetector")
+        self._check_sinks(sinks or [])
         print(f"Starting scrape for up to {max_pages} pages...")
-        for page in range(1, max_pages + 1):
-            data = self.scrape_page(page)
-            if not data:
-                print(f"No data found on page {page}. Stopping.")
-                break # Stop if a page fails or is empty
-            self.all_data.extend(data)
-            print(f"Collected {len(data)} quotes from page {page}.")
-        print(f"Scraping finished. Total quotes collected: {len(self.all_data)}")
+        self.sinks = list(sinks or [])
+        self.journal = journal
+        self.total_quotes = 0
+        first_page = 1
+        if journal:
+            journal.restore(self.sinks)
+            first_page = journal.completed_pages() + 1
+            if first_page > 1:
+                if not self.sinks:
+                    self.all_data = list(journal.records())
+                self.total_quotes = sum(1 for _ in journal.records())
+                print(f"Resuming from page {first_page}.")
+        self._reset_stats()
+        self._stop_reason = None
+        if self.changes:
+            self.changes.start_run()
+        connections_before = self._connections_opened()
+        if parse_workers:
+            # Spawn rather than fork: forking while fetch threads hold locks can deadlock
+            with ProcessPoolExecutor(parse_workers, mp_context=multiprocessing.get_context('spawn')) as parse_pool:
+                asyncio.run(self._run_async(first_page, max_pages, max(concurrency, parse_workers),
+                                            parse_pool, parse_queue_size=2 * parse_workers))
+        elif concurrency > 1:
+            asyncio.run(self._run_async(first_page, max_pages, concurrency))
+        else:
+            for page in range(first_page, max_pages + 1):
+                data = self.scrape_page(page)
+                if not self._collect_page(page, data):
+                    break
+        self._finish_changes()
+        if journal:
+            journal.checkpoint(self.sinks)
+        else:
+            for sink in self.sinks:
+                sink.flush()
+        new_connections = self._connections_opened() - connections_before
+        self.stats['new_connections'] = new_connections
+        self.stats['reused_connections'] = max(self.stats['requests'] - new_connections, 0)
+        print(f"Scraping finished. Total quotes collected: {self.total_quotes}")
+        print(f"Requests: {self.stats['requests']}, connections reused: {self.stats['reused_connections']}, "
+              f"retries: {self.stats['retries']}")
+        if self.cache:
+            lookups = self.stats['cache_hits'] + self.stats['cache_misses']
+            hit_ratio = self.stats['cache_hits'] / lookups if lookups else 0.0
+            print(f"Cache hit ratio: {hit_ratio:.0%}, bytes saved: {self.stats['bytes_saved']:,}")
+        if self.enricher:
+            print(f"Author pages: {self.enricher.stats['misses']} fetched, {self.enricher.stats['hits']} cache hits, "
+                  f"{self.enricher.stats['coalesced']} coalesced")
+        if self.changes:
+            print(f"Changes: {self.stats['inserts']} inserts, {self.stats['updates']} updates, "
+                  f"{self.stats['deletes']} deletes ({self.stats['unchanged_pages']} pages unchanged)")
+        self._print_rate_limits()
+
+    def _print_rate_limits(self):
+        """Reports the rate limiter's current per-host limits."""
+        if not self.rate_limiter:
+            return
+        for host, metrics in self.rate_limiter.metrics().items():
+            print(f"Rate limit for {host}: {metrics['rate']:.1f} req/s, "
+                  f"concurrency {metrics['concurrency']}, latency {metrics['latency_ms']:.0f} ms")
+
+    def _scrape_url(self, url):
+        """Fetches any URL and returns (quotes, links found on the page)."""
+        response = self._fetch_page(url)
+        if response is None or 'html' not in response.headers.get('Content-Type', 'text/html'):
+            return [], []
+        links = []
+        quotes = self._parse_page(response.text, url, links)
+        return quotes, links
+
+    def crawl(self, start_url=None, max_pages=1000, max_depth=3, concurrency=1, sinks=None):
+        """Crawls by following links instead of numbered pages.
+
+        Starting from start_url (the base URL by default), every same-host
+        link is normalised, deduplicated and queued, shallowest first. Tag
+        and author pages are found this way too. Records carry the page URL
+        in their 'page' field. A quote shown on several pages, e.g. on the
+        front page and a tag page, is emitted only once. Up to `concurrency`
+        URLs are fetched at once.
+        """
+        start_url = normalize_url(start_url or self.base_url + '/')
+        host = urlsplit(start_url).netloc
+        frontier = CrawlFrontier(max_depth)
+        frontier.push(start_url, 0)
+        seen_quotes = FingerprintSet()
+        self.sinks = list(sinks or [])
+        self.total_quotes = 0
+        self._reset_stats()
+        crawled = 0
+        print(f"Starting crawl of up to {max_pages} pages from {start_url}...")
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while frontier and crawled < max_pages:
+                self._set_gauge('frontier_size', len(frontier))
+                batch = [frontier.pop() for _ in range(min(concurrency, len(frontier), max_pages - crawled))]
+                results = executor.map(lambda item: self._scrape_url(item[0]), batch)
+                for (url, depth), (quotes, links) in zip(batch, results):
+                    crawled += 1
+                    quotes = [q for q in quotes if seen_quotes.add(f"{q['author']}\0{q['quote']}")]
+                    self._emit(quotes)
+                    self.total_quotes += len(quotes)
+                    for link in links:
+                        link = normalize_url(link, url)
+                        if link and urlsplit(link).netloc == host:
+                            frontier.push(link, depth + 1)
+        for sink in self.sinks:
+            sink.flush()
+        print(f"Crawl finished. Pages crawled: {crawled}, URLs discovered: {len(frontier.seen)}, "
+              f"quotes collected: {self.total_quotes}")
+        self._print_rate_limits()
+
+    def run_worker(self, queue, worker_id=None, concurrency=1, poll_interval=0.5):
+        """Scrapes pages leased from a WorkQueue until none are left.
+
+        Several workers, in other processes or on other machines sharing
+        the queue file, can run at once. Each one leases `concurrency`
+        pages at a time and scrapes them in parallel. Pages that cannot be
+        fetched go back to the queue rather than being committed as empty.
+        """
+        owner = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        committed = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                pages = queue.lease(owner, concurrency)
+                if not pages:
+                    if not queue.unfinished():
+                        break
+                    time.sleep(poll_interval) # Others hold the remaining leases
+                    continue
+                for page, records in zip(pages, executor.map(self.scrape_page, pages)):
+                    if records is None:
+                        queue.release(page, owner) # A fetch error is not an empty page
+                    else:
+                        committed += queue.commit(page, owner, records)
+        print(f"Worker {owner} finished, committed {committed} pages.")
+        return committed
+
+    def run_distributed(self, queue_path, max_pages=5, workers=4, concurrency=1, sinks=None,
+                        visibility_timeout=60, max_attempts=3):
+        """Coordinates a crawl split across worker processes through a WorkQueue.
+
+        Pages 1..max_pages are queued in queue_path, `workers` worker
+        processes scrape them, and the results are collected in page order
+        into all_data or the sinks. The workers use this scraper's parser,
+        timeout and retry settings; author enrichment and change detection
+        run here on the collected pages. A cache, rate limiter or metrics
+        cannot be shared with the workers and raise ValueError. Re-running after a crash picks up
+        the same queue: finished pages are kept, and expired leases and
+        pages that failed max_attempts fetches are retried. Extra workers,
+        e.g. on other machines sharing the file, can join with run_worker.
+        """
+        if self.cache or self.rate_limiter or self.metrics:
+            raise ValueError("run_distributed does not support a cache, rate limiter or metrics: "
+                             "they live in this process and the workers could not share them")
+        self._check_sinks(sinks or [])
+        print(f"Starting distributed scrape for up to {max_pages} pages with {workers} workers...")
+        self.sinks = list(sinks or [])
+        self.journal = None
+        self.total_quotes = 0
+        self._reset_stats()
+        queue = WorkQueue(queue_path, visibility_timeout, max_attempts)
+        queue.enqueue(range(1, max_pages + 1))
+        scraper_kwargs = {'parser': self.parser, 'timeout': self.timeout, 'max_retries': self.max_retries,
+                          'backoff_factor': self.backoff_factor}
+        spawn = multiprocessing.get_context('spawn')
+        processes = [
+            spawn.Process(target=_worker_main,
+                          args=(self.base_url, queue_path, visibility_timeout, max_attempts,
+                                scraper_kwargs, concurrency))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        if queue.unfinished():
+            # Every worker died: finish the remaining pages here
+            self.run_worker(queue, concurrency=concurrency)
+
+        # Enrichment and change detection run here, on the collected pages
+        self._stop_reason = None
+        if self.changes:
+            self.changes.start_run()
+        for page, records in queue.results():
+            if self.changes and records:
+                # No body reached this process: hash the records so diff() compares them
+                body = json.dumps(records, sort_keys=True).encode('utf-8')
+                self._page_hashes[self._page_url(page)] = ChangeDetector.body_hash(body)
+            self._collect_page(page, records)
+        failed = queue.failed()
+        if failed and self._stop_reason != 'empty':
+            self._stop_reason = 'fetch_failed'
+        self._finish_changes()
+        for sink in self.sinks:
+            sink.flush()
+        queue.close()
+        print(f"Scraping finished. Total quotes collected: {self.total_quotes}")
+        if failed:
+            print(f"Pages {failed} could not be fetched in {max_attempts} attempts; "
+                  f"results stop before the first of them. Re-run to retry them.")
+        if self.changes:
+            print(f"Changes: {self.stats['inserts']} inserts, {self.stats['updates']} updates, "
+                  f"{self.stats['deletes']} deletes")
 
 
 # EXECUTION: The main script becomes clean and readable!
@@ -55,4 +1789,4 @@ if __name__ == '__main__':
     
     # Example: print the data
     for item in scraper.all_data:
-        print(f"[{item['page']}] {item['author']}: {item['quote'][:50]}...")
\ No newline at end of file
+        print(f"[{item['page']}] {item['author']}: {item['quote'][:50]}...")
@@ -0,0 +1,243 @@
+import json
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left
+
+from QuoteScraper import Sink
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercased word tokens used by the full-text index."""
+    return TOKEN_RE.findall(text.lower())
+
+
+class QuoteStoreWriter(Sink):
+    """Builds a QuoteStore directory from scraped records.
+
+    It is a Sink, so it can be passed straight to run_scraper. Quote text is
+    appended to one UTF-8 file as records arrive. Authors, pages and tags are
+    dictionary-encoded into integer columns, and the inverted index is
+    written out by close().
+
+    Everything but the quote text lives in memory until close(), so a
+    crashed crawl leaves nothing to roll back to or append to. The writer
+    therefore cannot be used with a CrawlJournal, which rejects it, and
+    always starts a new store.
+    """
+
+    fields = ('author', 'quote', 'page', 'tags')
+
+    def __init__(self, directory, batch_size=500):
+        super().__init__(batch_size)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.text_file = open(os.path.join(directory, 'text.bin'), 'wb')
+        self.text_offsets = array('Q', [0])
+        self.author_ids = array('I')
+        self.page_ids = array('I')
+        self.tag_ids = array('I')
+        self.tag_offsets = array('Q', [0])
+        self.dictionaries = {'authors': {}, 'pages': {}, 'tags': {}}
+        self.term_postings = {} # term -> array of row numbers
+        self.rows = 0
+
+    def _encode(self, dictionary, value):
+        """Returns the id of value in one of the dictionaries, adding it if new."""
+        ids = self.dictionaries[dictionary]
+        if value not in ids:
+            ids[value] = len(ids)
+        return ids[value]
+
+    def _write_batch(self, batch):
+        for record in batch:
+            row = self.rows
+            text = record['quote'].encode('utf-8')
+            self.text_file.write(text)
+            self.text_offsets.append(self.text_offsets[-1] + len(text))
+            self.author_ids.append(self._encode('authors', record['author']))
+            self.page_ids.append(self._encode('pages', record['page']))
+            for tag in record.get('tags', ()):
+                self.tag_ids.append(self._encode('tags', tag))
+            self.tag_offsets.append(len(self.tag_ids))
+            for term in set(tokenize(record['quote'])):
+                self.term_postings.setdefault(term, array('I')).append(row)
+            self.rows += 1
+
+    def position(self):
+        """None: a store cannot be rolled back, see the class docstring."""
+        return None
+
+    def _write_column(self, name, values):
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            values.tofile(f)
+
+    def close(self):
+        """Flushes the last batch and writes the columns, dictionaries and index."""
+        super().close()
+        self.text_file.close()
+        self._write_column('text.offsets', self.text_offsets)
+        self._write_column('authors.col', self.author_ids)
+        self._write_column('pages.col', self.page_ids)
+        self._write_column('tags.col', self.tag_ids)
+        self._write_column('tags.offsets', self.tag_offsets)
+
+        # Postings for terms, authors and tags share one file of row numbers
+        postings = array('I')
+        directory = {}
+        for kind, groups in (('terms', self.term_postings),
+                             ('authors', self._group_rows(self.author_ids, self.rows)),
+                             ('tags', self._group_tag_rows())):
+            directory[kind] = {}
+            for key, rows in groups.items():
+                directory[kind][key] = (len(postings), len(rows))
+                postings.extend(rows)
+        self._write_column('postings.bin', postings)
+
+        meta = {
+            'rows': self.rows,
+            'authors': list(self.dictionaries['authors']),
+            'pages': list(self.dictionaries['pages']),
+            'tags': list(self.dictionaries['tags']),
+            'postings': {
+                'terms': directory['terms'],
+                # Keyed by dictionary id; JSON keys are strings
+                'authors': {str(k): v for k, v in directory['authors'].items()},
+                'tags': {str(k): v for k, v in directory['tags'].items()},
+            },
+        }
+        with open(os.path.join(self.directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @staticmethod
+    def _group_rows(ids, rows):
+        groups = {}
+        for row in range(rows):
+            groups.setdefault(ids[row], array('I')).append(row)
+        return groups
+
+    def _group_tag_rows(self):
+        groups = {}
+        for row in range(self.rows):
+            for tag_id in self.tag_ids[self.tag_offsets[row]:self.tag_offsets[row + 1]]:
+                groups.setdefault(tag_id, array('I')).append(row)
+        return groups
+
+
+class QuoteStore:
+    """Read side of a QuoteStore directory.
+
+    Columns are memory-mapped, not loaded, so opening a store of millions
+    of quotes is cheap. Keyword and author lookups read only the postings
+    they need.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.rows = meta['rows']
+        self.authors = meta['authors']
+        self.pages = meta['pages']
+        self.tags = meta['tags']
+        self._author_ids = {name: i for i, name in enumerate(self.authors)}
+        self._tag_ids = {name: i for i, name in enumerate(self.tags)}
+        self._term_postings = meta['postings']['terms']
+        self._author_postings = meta['postings']['authors']
+        self._tag_postings = meta['postings']['tags']
+        self._maps = []
+        self.text = self._map('text.bin')
+        self.text_offsets = self._map('text.offsets', 'Q')
+        self.author_col = self._map('authors.col', 'I')
+        self.page_col = self._map('pages.col', 'I')
+        self.tag_col = self._map('tags.col', 'I')
+        self.tag_offsets = self._map('tags.offsets', 'Q')
+        self.postings = self._map('postings.bin', 'I')
+
+    @classmethod
+    def build(cls, directory, records):
+        """Writes records to a new store in directory and opens it."""
+        with QuoteStoreWriter(directory) as writer:
+            writer.write(records)
+        return cls(directory)
+
+    def _map(self, name, typecode=None):
+        """Memory-maps one column file as a memoryview of typecode items."""
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                view = memoryview(array(typecode or 'B')) # mmap cannot map empty files
+                return view if typecode else view.tobytes()
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast(typecode) if typecode else mapped
+
+    def _rows(self, entry):
+        if entry is None:
+            return self.postings[0:0]
+        offset, count = entry
+        return self.postings[offset:offset + count]
+
+    def record(self, row):
+        """The record stored at row, decoded back into a dict."""
+        text = self.text[self.text_offsets[row]:self.text_offsets[row + 1]]
+        record = {
+            'author': self.authors[self.author_col[row]],
+            'quote': bytes(text).decode('utf-8'),
+            'page': self.pages[self.page_col[row]],
+        }
+        tag_ids = self.tag_col[self.tag_offsets[row]:self.tag_offsets[row + 1]]
+        if len(tag_ids):
+            record['tags'] = [self.tags[tag_id] for tag_id in tag_ids]
+        return record
+
+    def search(self, keywords='', author=None, tag=None, limit=None):
+        """Quotes containing every keyword, optionally filtered by author and tag."""
+        postings = [self._rows(self._term_postings.get(term)) for term in tokenize(keywords)]
+        if author is not None:
+            author_id = self._author_ids.get(author)
+            postings.append(self._rows(None if author_id is None else self._author_postings.get(str(author_id))))
+        if tag is not None:
+            tag_id = self._tag_ids.get(tag)
+            postings.append(self._rows(None if tag_id is None else self._tag_postings.get(str(tag_id))))
+        if not postings:
+            return []
+        return [self.record(row) for row in self._intersect(postings, limit)]
+
+    def by_author(self, author, limit=None):
+        """All quotes by one author."""
+        return self.search(author=author, limit=limit)
+
+    @staticmethod
+    def _intersect(postings, limit=None):
+        """Rows present in every sorted postings list.
+
+        Walks the shortest list and binary-searches the others, so the cost
+        depends on the rarest term rather than the most common one.
+        """
+        postings = sorted(postings, key=len)
+        shortest, others = postings[0], postings[1:]
+        rows = []
+        for row in shortest:
+            if all(QuoteStore._contains(other, row) for other in others):
+                rows.append(row)
+                if limit is not None and len(rows) >= limit:
+                    break
+        return rows
+
+    @staticmethod
+    def _contains(sorted_rows, row):
+        index = bisect_left(sorted_rows, row)
+        return index < len(sorted_rows) and sorted_rows[index] == row
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        for view in (self.text_offsets, self.author_col, self.page_col, self.tag_col,
+                     self.tag_offsets, self.postings):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
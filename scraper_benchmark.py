@@ -0,0 +1,266 @@
+"""Benchmarks QuoteScraper against a local stand-in for quotes.toscrape.com.
+
+Every run_scraper/crawl mode runs in its own process against a local fixture
+server with configurable latency, page size and error rate, and reports
+pages/sec, p50/p99 fetch latency, parse time and the peak RSS of the scraping
+process and of its largest parse worker.
+
+Run with: python scraper_benchmark.py --help
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import random
+import re
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bs4 import BeautifulSoup
+
+from QuoteScraper import PARSERS, QuoteScraper
+
+QUOTE_HTML = """<div class="quote" itemscope itemtype="http://schema.org/CreativeWork">
+    <span class="text" itemprop="text">“Quote {page}-{i}: the world as we have created it is a process of <em>our</em> thinking &amp; doing.”</span>
+    <span>by <small class="author" itemprop="author">Author {i}</small>
+    <a href="/author/Author-{i}">(about)</a>
+    </span>
+    <div class="tags">
+        Tags:
+        <a class="tag" href="/tag/change/page/1/">change</a>
+        <a class="tag" href="/tag/thinking/page/1/">thinking</a>
+    </div>
+</div>"""
+
+
+def make_page(page, quotes_per_page=10, has_next=False):
+    """Builds a synthetic quotes page that looks like the real site."""
+    quotes = "\n".join(QUOTE_HTML.format(page=page, i=i) for i in range(quotes_per_page))
+    pager = f'<nav><ul class="pager"><li class="next"><a href="/page/{page + 1}/">Next</a></li></ul></nav>' if has_next else ''
+    return f"<html><body><div class='col-md-8'>{quotes}{pager}</div></body></html>"
+
+
+def make_author_page(slug):
+    """Builds a synthetic author bio page."""
+    return (f"<html><body><div class='author-details'><h3 class='author-title'>{slug.replace('-', ' ')}</h3>"
+            f"<p><strong>Born:</strong> <span class='author-born-date'>March 14, 1879</span> "
+            f"<span class='author-born-location'>in Ulm, Germany</span></p>"
+            f"<div class='author-description'>\n  A synthetic biography of {slug}.\n</div></div></body></html>")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # The default backlog of 5 stalls concurrent clients
+
+
+class FixtureServer:
+    """A tiny threaded HTTP server that serves synthetic quote pages."""
+
+    def __init__(self, num_pages=50, latency=0.05, quotes_per_page=10, error_rate=0.0):
+        self.num_pages = num_pages
+        self.latency = latency
+        self.quotes_per_page = quotes_per_page
+        self.error_rate = error_rate
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # Keep-alive, like the real site
+            disable_nagle_algorithm = True
+            def do_GET(self):
+                time.sleep(fixture.latency) # Simulated network round trip
+                if random.random() < fixture.error_rate:
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                parts = [p for p in self.path.split('/') if p]
+                page = int(parts[1]) if len(parts) == 2 and parts[0] == 'page' else 0
+                if not parts:
+                    page = 1 # The home page lists the first page, like the real site
+                if len(parts) == 2 and parts[0] == 'author':
+                    body = make_author_page(parts[1])
+                elif 1 <= page <= fixture.num_pages:
+                    body = make_page(page, fixture.quotes_per_page, has_next=page < fixture.num_pages)
+                else:
+                    body = make_page(page, 0)
+                data = body.encode('utf-8')
+                etag = f'"{hashlib.md5(data).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass # Keep the benchmark output readable
+
+        self.server = _Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TimedScraper(QuoteScraper):
+    """QuoteScraper that records how long each request and each in-process parse takes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fetch_times = []
+        self.parse_times = []
+
+    def _send(self, url, headers=None):
+        start = time.perf_counter()
+        try:
+            return super()._send(url, headers)
+        finally:
+            self.fetch_times.append(time.perf_counter() - start)
+
+    def _parse_page(self, html, page_num, links=None):
+        start = time.perf_counter()
+        try:
+            return super()._parse_page(html, page_num, links)
+        finally:
+            self.parse_times.append(time.perf_counter() - start)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list, q in [0, 100]."""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MB of this process, or with RUSAGE_CHILDREN of
+    the largest child process that has exited and been waited for."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KB elsewhere
+
+
+def modes(args):
+    """Name -> (QuoteScraper kwargs, method name, method kwargs) for every mode we benchmark."""
+    pages = args.pages + 1 # One past the end, so the crawl stops on the first empty page
+    return {
+        'sequential': ({}, 'run_scraper', {'max_pages': pages}),
+        'async': ({}, 'run_scraper', {'max_pages': pages, 'concurrency': args.concurrency}),
+        'async+stream': ({'parser': 'stream'}, 'run_scraper',
+                         {'max_pages': pages, 'concurrency': args.concurrency}),
+        'pipeline': ({}, 'run_scraper', {'max_pages': pages, 'concurrency': args.concurrency,
+                                         'parse_workers': args.parse_workers}),
+        'crawl': ({}, 'crawl', {'max_pages': pages * 2, 'max_depth': pages,
+                                'concurrency': args.concurrency}),
+    }
+
+
+def run_mode(base_url, scraper_kwargs, method, method_kwargs):
+    """Runs one mode in a fresh process and returns its measurements."""
+    scraper = TimedScraper(base_url, pool_size=64, backoff_factor=0.05, **scraper_kwargs)
+    with contextlib.redirect_stdout(io.StringIO()): # Silence the per-page progress lines
+        start = time.perf_counter()
+        getattr(scraper, method)(**method_kwargs)
+        elapsed = time.perf_counter() - start
+    pages = len(scraper.fetch_times) - scraper.stats['retries']
+    return {
+        'pages': pages,
+        'quotes': scraper.total_quotes,
+        'retries': scraper.stats['retries'],
+        'pages_per_sec': pages / elapsed,
+        'p50_ms': percentile(scraper.fetch_times, 50) * 1000,
+        'p99_ms': percentile(scraper.fetch_times, 99) * 1000,
+        # Pipeline parses happen in worker processes and are not timed here
+        'parse_ms': sum(scraper.parse_times) / len(scraper.parse_times) * 1000 if scraper.parse_times else None,
+        'peak_rss_mb': peak_rss_mb(),
+        # Parse workers have been joined by now; 0 when the mode runs in one process
+        'child_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def reference_quotes(html, page_num):
+    """The original full-tree html.parser extraction, used as the parity baseline."""
+    soup = BeautifulSoup(html, 'html.parser')
+    return [
+        {'author': quote.find('small', class_='author').text,
+         'quote': quote.find('span', class_='text').text.strip().replace('“', '').replace('”', ''),
+         'page': page_num,
+         'author_url': quote.find('a', href=re.compile(r'^/author/'))['href'],
+         'tags': [tag.get_text() for tag in quote.select('div.tags a.tag')]}
+        for quote in soup.find_all('div', class_='quote')
+    ]
+
+
+def benchmark_parsers(pages=50, quotes_per_page=10, repeat=3):
+    """Checks every parser backend against the baseline and returns ms per page."""
+    htmls = [make_page(page, quotes_per_page) for page in range(1, pages + 1)]
+    expected = [reference_quotes(html, page) for page, html in enumerate(htmls, 1)]
+    results = {}
+    for parser in PARSERS:
+        try:
+            scraper = QuoteScraper('http://unused', parser=parser)
+            scraper._parse_page(htmls[0], 1)
+        except Exception as e: # e.g. lxml is not installed
+            print(f"Skipping {parser}: {e}")
+            continue
+        parsed = [scraper._parse_page(html, page) for page, html in enumerate(htmls, 1)]
+        assert parsed == expected, f"{parser} output differs from the baseline"
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for page, html in enumerate(htmls, 1):
+                scraper._parse_page(html, page)
+            best = min(best, time.perf_counter() - start)
+        results[parser] = best / pages * 1000
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=100, help='pages served by the fixture')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every response')
+    parser.add_argument('--quotes-per-page', type=int, default=10, help='controls the page size')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--parse-workers', type=int, default=4)
+    parser.add_argument('--modes', nargs='+', help='subset of modes to run (default: all)')
+    args = parser.parse_args()
+
+    print("Parse time per page:")
+    for name, ms in benchmark_parsers(quotes_per_page=args.quotes_per_page).items():
+        print(f"{name:>12}: {ms:6.2f} ms/page")
+    print()
+
+    all_modes = modes(args)
+    selected = args.modes or list(all_modes)
+    spawn = multiprocessing.get_context('spawn')
+    with FixtureServer(args.pages, args.latency, args.quotes_per_page, args.error_rate) as server:
+        print(f"{'mode':>12} {'pages/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'parse ms':>8} "
+              f"{'RSS MB':>7} {'child MB':>8} {'pages':>6} {'quotes':>7} {'retries':>7}")
+        for name in selected:
+            # A fresh process per mode keeps the peak RSS numbers independent
+            with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                r = pool.submit(run_mode, server.url, *all_modes[name]).result()
+            parse_ms = f"{r['parse_ms']:8.2f}" if r['parse_ms'] is not None else f"{'-':>8}"
+            print(f"{name:>12} {r['pages_per_sec']:8.1f} {r['p50_ms']:7.1f} {r['p99_ms']:7.1f} {parse_ms} "
+                  f"{r['peak_rss_mb']:7.1f} {r['child_rss_mb']:8.1f} {r['pages']:6d} {r['quotes']:7d} {r['retries']:7d}")
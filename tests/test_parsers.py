@@ -0,0 +1,67 @@
+"""Parser backend parity on a copy of page 1 of quotes.toscrape.com.
+
+The synthetic pages of scraper_benchmark are regular by construction; the
+real markup has the quirks that trip parsers up, such as the
+<meta class="keywords" ... /    > tag, the (about) links and the a.tag links
+of the Top Ten tags box, which sit outside any quote.
+"""
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from QuoteScraper import PARSERS, parse_quotes
+from scraper_benchmark import reference_quotes
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'quotes_page1.html')
+
+
+@pytest.fixture(scope='module')
+def html():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture(params=PARSERS)
+def parser(request):
+    if request.param == 'lxml':
+        pytest.importorskip('lxml')
+    return request.param
+
+
+def test_matches_reference(html, parser):
+    assert parse_quotes(html, 1, parser) == reference_quotes(html, 1)
+
+
+def test_fields(html, parser):
+    quotes = parse_quotes(html, 1, parser)
+    assert len(quotes) == 10
+    assert quotes[0] == {
+        'author': 'Albert Einstein',
+        'quote': 'The world as we have created it is a process of our thinking. '
+                 'It cannot be changed without changing our thinking.',
+        'page': 1,
+        'author_url': '/author/Albert-Einstein',
+        'tags': ['change', 'deep-thoughts', 'thinking', 'world'],
+    }
+    assert [quote['author_url'] for quote in quotes] == [
+        '/author/Albert-Einstein', '/author/J-K-Rowling', '/author/Albert-Einstein', '/author/Jane-Austen',
+        '/author/Marilyn-Monroe', '/author/Albert-Einstein', '/author/Andre-Gide', '/author/Thomas-A-Edison',
+        '/author/Eleanor-Roosevelt', '/author/Steve-Martin',
+    ]
+    assert quotes[6]['author'] == 'André Gide'
+    assert quotes[7]['quote'] == "I have not failed. I've just found 10,000 ways that won't work."
+    assert quotes[8]['tags'] == ['misattributed-eleanor-roosevelt']
+    # The Top Ten tags box is not part of the last quote
+    assert quotes[9]['tags'] == ['humor', 'obvious', 'simile']
+
+
+def test_links(html, parser):
+    links = []
+    parse_quotes(html, 1, parser, links)
+    expected = [a['href'] for a in BeautifulSoup(html, 'html.parser').find_all('a', href=True)]
+    assert links == expected
+    assert len(links) == 55
+    assert links[:2] == ['/', '/login']
+    assert '/page/2/' in links
+    assert links[-2:] == ['https://www.goodreads.com/quotes', 'https://www.zyte.com']